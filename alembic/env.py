@@ -3,6 +3,7 @@ from logging.config import fileConfig
 from sqlalchemy.ext.asyncio import create_async_engine
 from alembic import context
 from app.models.user import Base  # import your Base
+from app.models import room  # noqa: F401  (registers rooms and memberships on Base)
 from app.core.config import settings
 
 config = context.config
@@ -15,16 +16,20 @@ def get_url():
 def run_migrations_online():
     connectable = create_async_engine(get_url(), future=True)
 
-    async def do_run_migrations(connection):
-        await connection.run_sync(
-            lambda conn: context.configure(
-                connection=conn,
-                target_metadata=target_metadata,
-                compare_type=True,
-            )
+    def do_run_migrations(connection):
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
         )
-        await connection.run_sync(context.run_migrations)
+        with context.begin_transaction():
+            context.run_migrations()
 
-    asyncio.run(do_run_migrations(connectable.connect()))
+    async def run_async_migrations():
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_run_migrations)
+        await connectable.dispose()
+
+    asyncio.run(run_async_migrations())
 
 run_migrations_online()
@@ -0,0 +1,32 @@
+"""add users token_version
+
+Revision ID: bfa1c2fedfc2
+Revises: 76859dfe1304
+Create Date: 2026-10-17 22:19:46.429099
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bfa1c2fedfc2'
+down_revision: Union[str, Sequence[str], None] = '76859dfe1304'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows start at version 0, matching tokens already issued
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "token_version")
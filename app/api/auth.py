@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_pg_session
 from app.schemas.user import UserCreate, UserResponse, Token
 from app.services.user_service import UserService
-from app.core.security import create_access_token
+from app.core.security import create_access_token, user_claims
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter()
@@ -21,5 +21,5 @@ async def login(form_data: UserCreate, session: AsyncSession = Depends(get_pg_se
     user = await UserService.authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    access_token = create_access_token({"sub": str(user.id)})
+    access_token = create_access_token(user_claims(user))
     return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
@@ -0,0 +1,32 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.core.config import settings
+from app.core import database
+from app.services.history_cache import RecentHistoryCache
+from app.core.profiling import profile_store
+
+def require_diagnostics_access(x_diagnostics_token: Optional[str] = Header(None)):
+    if not settings.diagnostics_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_diagnostics_token or not secrets.compare_digest(x_diagnostics_token, settings.diagnostics_token):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+router = APIRouter(dependencies=[Depends(require_diagnostics_access)])
+
+@router.get("/history-cache")
+async def history_cache_stats():
+    return RecentHistoryCache.stats()
+
+@router.get("/slow-requests")
+async def slow_requests():
+    return profile_store.snapshot()
+
+@router.delete("/slow-requests")
+async def clear_slow_requests():
+    profile_store.clear()
+    return {"success": True}
+
+@router.get("/pools")
+async def pool_stats():
+    return database.pool_stats()
@@ -0,0 +1,110 @@
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+from app.core.config import settings
+
+router = APIRouter()
+
+# Content-addressed names never change meaning, so caches may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ATTACHMENT_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})(?P<variant>_thumb|_preview)?(?P<ext>\.[A-Za-z0-9]+)?$")
+STREAM_CHUNK_SIZE = 256 * 1024
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    # Single byte ranges only; anything else is served in full
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+class AttachmentResponse(Response):
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        file = await run_in_threadpool(open, self.path, "rb")
+        try:
+            count = self.end - self.start + 1
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": self.start, "count": count})
+                return
+            await run_in_threadpool(file.seek, self.start)
+            # Always end on a more_body=False message, even for empty or truncated files
+            more_body = True
+            while more_body:
+                chunk = await run_in_threadpool(file.read, min(STREAM_CHUNK_SIZE, count))
+                count -= len(chunk)
+                more_body = bool(chunk) and count > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        finally:
+            await run_in_threadpool(file.close)
+
+@router.api_route("/uploads/{shard}/{name}", methods=["GET", "HEAD"])
+async def get_attachment(shard: str, name: str, request: Request):
+    match = ATTACHMENT_NAME.match(name)
+    if not match or match.group("digest")[:2] != shard:
+        raise HTTPException(status_code=404, detail="Not found")
+    etag = f'"{match.group("digest")}{match.group("variant") or ""}"'
+    headers = {"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL, "accept-ranges": "bytes"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    path = os.path.join(settings.upload_dir, shard, name)
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if settings.attachment_accel_redirect_prefix:
+        # Let the fronting proxy send the file with sendfile(2)
+        headers["x-accel-redirect"] = f"{settings.attachment_accel_redirect_prefix}/{shard}/{name}"
+        return Response(headers=headers, media_type=media_type)
+    start, end, status_code = 0, stat.st_size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag and stat.st_size > 0:
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat.st_size}"})
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{stat.st_size}"
+    return AttachmentResponse(path, start, end, status_code, headers, media_type)
+
+@router.api_route("/uploads/{name}", methods=["GET", "HEAD"])
+async def get_legacy_attachment(name: str, request: Request):
+    # Uploads from before content addressing live flat as {room}_{user}_{filename},
+    # and existing messages still link there
+    if name.startswith(".") or os.path.basename(name) != name:
+        raise HTTPException(status_code=404, detail="Not found")
+    path = os.path.join(settings.upload_dir, name)
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not S_ISREG(stat.st_mode):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, stat_result=stat, method=request.method)
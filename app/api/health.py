@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.health_service import HealthService
+
+router = APIRouter()
+
+# Both endpoints answer from cached probe results and never touch a datastore
+
+@router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness():
+    report = HealthService.readiness()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@router.get("/health")
+async def health():
+    # Original shape (one flag per dependency) plus the detailed report
+    report = HealthService.readiness()
+    return {**{name: check["ok"] for name, check in report["checks"].items()}, **report}
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Form, UploadFile, File, Query
 from app.core.security import get_current_user
 from app.schemas.user import UserResponse
-from app.schemas.message import MessageCreate, MessageResponse
+from app.schemas.message import MessageCreate, MessageResponse, MessagePage
 from app.services.message_service import MessageService
+from app.services.notification_service import NotificationService
+from app.services.membership_index import MembershipIndex
+from app.services.room_service import RoomService
+from app.services.file_service import FileService, FileTooLarge
 from app.core.database import get_mongo_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_pg_session
@@ -11,22 +15,38 @@ from sqlalchemy.future import select
 from typing import List, Optional
 import os
 from app.core.config import settings
+from app.core import metrics
+from app.core import profiling
 from app.utils.rate_limiter import rate_limit
 from datetime import datetime
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.upload_dir, exist_ok=True)
 
 router = APIRouter()
 
+@metrics.timed("require_room_membership")
 async def require_room_membership(session: AsyncSession, room_id: str, user_id: str):
-    result = await session.execute(
-        select(RoomMembership).where(RoomMembership.room_id == room_id, RoomMembership.user_id == user_id)
-    )
-    membership = result.scalars().first()
-    if not membership:
+    with profiling.stage("membership"):
+        member = await MembershipIndex.is_member(room_id, user_id, session)
+    if not member:
         raise HTTPException(status_code=403, detail="Not a member of this room")
-    return membership
+    return True
+
+@router.post("/upload")
+async def upload_file(
+    file: UploadFile = File(...),
+    room_id: str = Form(...),
+    current_user: UserResponse = Depends(get_current_user),
+    session: AsyncSession = Depends(get_pg_session)
+):
+    await require_room_membership(session, room_id, str(current_user.id))
+    # Validate file type (basic) before touching the body
+    if FileService.extension_for(file.content_type) is None:
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+    try:
+        return await FileService.store_upload(file)
+    except FileTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
 
 @router.post("/{room_id}", response_model=MessageResponse)
 @rate_limit()
@@ -42,14 +62,17 @@ async def send_message(
         msg = await MessageService.create_message(mongo_db, room_id, str(current_user.id), current_user.username, message_data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    NotificationService.dispatch(room_id, str(current_user.id))
     return msg
 
-@router.get("/{room_id}", response_model=List[MessageResponse])
+@router.get("/{room_id}", response_model=MessagePage)
 async def get_messages(
     room_id: str,
-    skip: int = 0,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     search: Optional[str] = None,
+    skip: int = 0,
     current_user: UserResponse = Depends(get_current_user),
     mongo_db=Depends(get_mongo_db),
     session: AsyncSession = Depends(get_pg_session)
@@ -57,9 +80,11 @@ async def get_messages(
     await require_room_membership(session, room_id, str(current_user.id))
     if search:
         messages = await MessageService.search_messages(mongo_db, room_id, search, skip, limit)
-    else:
-        messages = await MessageService.get_messages(mongo_db, room_id, skip, limit)
-    return messages
+        return {"messages": messages}
+    try:
+        return await MessageService.get_messages(mongo_db, room_id, limit, before, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{message_id}", response_model=MessageResponse)
 async def edit_message(
@@ -69,14 +94,10 @@ async def edit_message(
     mongo_db=Depends(get_mongo_db),
     session: AsyncSession = Depends(get_pg_session)
 ):
-    # Find message and check room membership
-    msg = await mongo_db.messages.find_one({"_id": message_id})
-    if not msg:
-        raise HTTPException(status_code=404, detail="Message not found")
-    await require_room_membership(session, msg["room_id"], str(current_user.id))
-    updated = await MessageService.edit_message(mongo_db, message_id, str(current_user.id), content)
+    room_ids = await MembershipIndex.get_user_rooms(current_user.id, session)
+    updated = await MessageService.edit_message(mongo_db, message_id, str(current_user.id), content, room_ids)
     if not updated:
-        raise HTTPException(status_code=403, detail="Not allowed to edit this message")
+        raise HTTPException(status_code=404, detail="Message not found or not allowed to edit it")
     return updated
 
 @router.delete("/{message_id}")
@@ -86,13 +107,11 @@ async def delete_message(
     mongo_db=Depends(get_mongo_db),
     session: AsyncSession = Depends(get_pg_session)
 ):
-    msg = await mongo_db.messages.find_one({"_id": message_id})
-    if not msg:
-        raise HTTPException(status_code=404, detail="Message not found")
-    await require_room_membership(session, msg["room_id"], str(current_user.id))
-    success = await MessageService.delete_message(mongo_db, message_id, str(current_user.id))
-    if not success:
-        raise HTTPException(status_code=403, detail="Not allowed to delete this message")
+    room_ids = await MembershipIndex.get_user_rooms(current_user.id, session)
+    admin_room_ids = await RoomService.get_admin_room_ids(session, current_user.id)
+    deleted = await MessageService.delete_message(mongo_db, message_id, str(current_user.id), room_ids, admin_room_ids)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Message not found or not allowed to delete it")
     return {"success": True}
 
 @router.post("/{message_id}/react", response_model=MessageResponse)
@@ -103,39 +122,12 @@ async def add_reaction(
     mongo_db=Depends(get_mongo_db),
     session: AsyncSession = Depends(get_pg_session)
 ):
-    msg = await mongo_db.messages.find_one({"_id": message_id})
-    if not msg:
-        raise HTTPException(status_code=404, detail="Message not found")
-    await require_room_membership(session, msg["room_id"], str(current_user.id))
-    updated = await MessageService.add_reaction(mongo_db, message_id, str(current_user.id), emoji)
+    room_ids = await MembershipIndex.get_user_rooms(current_user.id, session)
+    updated = await MessageService.add_reaction(mongo_db, message_id, str(current_user.id), emoji, room_ids)
     if not updated:
-        raise HTTPException(status_code=400, detail="Could not add reaction")
+        raise HTTPException(status_code=404, detail="Message not found")
     return updated
 
-@router.post("/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    room_id: str = Body(...),
-    current_user: UserResponse = Depends(get_current_user),
-    session: AsyncSession = Depends(get_pg_session)
-):
-    await require_room_membership(session, room_id, str(current_user.id))
-    # Validate file size
-    contents = await file.read()
-    if len(contents) > settings.max_file_size:
-        raise HTTPException(status_code=413, detail="File too large")
-    # Validate file type (basic)
-    allowed_types = ["image/png", "image/jpeg", "application/pdf", "text/plain"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=415, detail="Unsupported file type")
-    # Save file
-    filename = f"{room_id}_{current_user.id}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as f:
-        f.write(contents)
-    file_url = f"/uploads/{filename}"
-    return {"file_url": file_url}
-
 @router.post("/{message_id}/report")
 async def report_message(
     message_id: str,
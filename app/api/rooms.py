@@ -4,6 +4,8 @@ from app.core.database import get_mongo_db
 from app.core.database import get_pg_session
 from app.schemas.room import RoomCreate, RoomResponse, RoomMembershipResponse
 from app.services.room_service import RoomService
+from app.services.membership_index import MembershipIndex
+from app.services.presence_service import PresenceService
 from app.core.security import get_current_user
 from app.schemas.user import UserResponse
 from uuid import UUID
@@ -62,6 +64,17 @@ async def get_room_members(
     members = await RoomService.get_room_members(session, room_id)
     return members 
 
+@router.get("/{room_id}/presence")
+async def get_room_presence(
+    room_id: UUID,
+    session: AsyncSession = Depends(get_pg_session),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if not await MembershipIndex.is_member(room_id, current_user.id, session):
+        raise HTTPException(status_code=403, detail="Not a member of this room")
+    members = await MembershipIndex.get_room_members(room_id, session)
+    return await PresenceService.get_presence(members)
+
 @router.post("/{room_id}/ban/{user_id}")
 async def ban_user(
     room_id: UUID,
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Body, Depends
-from app.core.database import redis
+from app.services.presence_service import PresenceService
 from app.tasks.celery_tasks import send_notification
 from datetime import datetime
 
@@ -7,8 +7,8 @@ router = APIRouter()
 
 @router.get("/{user_id}/presence")
 async def get_user_presence(user_id: str):
-    online = await redis.get(f"user:{user_id}:online")
-    return {"online": bool(online)}
+    presence = await PresenceService.get_presence([user_id])
+    return {"online": presence[user_id]}
 
 @router.post("/{user_id}/notify")
 async def notify_user(user_id: str, message: str):
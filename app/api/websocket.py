@@ -1,54 +1,300 @@
+import asyncio
+import logging
+import time
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, status
-from typing import Dict, List
+from typing import Dict, Optional, Set
 from app.core.security import decode_access_token
 from app.services.room_service import RoomService
-from app.core.database import get_pg_session
+from app.services.membership_index import MembershipIndex
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from app.services.message_service import MessageService
+from app.services.notification_service import NotificationService
+from app.services.presence_service import PresenceService
+from app.services.message_writer import message_writer
+from app.services.history_cache import RecentHistoryCache
 from app.schemas.message import MessageCreate, MessageResponse
 from app.core.database import get_mongo_db
 from app.schemas.user import UserResponse
-from app.core.database import redis
+from app.core import database
+from app.core.config import settings
+from app.core import metrics
+from app.core import profiling
 from app.utils.rate_limiter import rate_limiter
+from app.services.websocket_service import Connection
+from app.utils.serialization import encode_frame
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        self.user_connections: Dict[str, WebSocket] = {}
+    def __init__(self, mode: Optional[str] = None, redis_client=None):
+        # room id -> sockets subscribed to it, user id -> that user's sockets
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        self.user_connections: Dict[str, Set[Connection]] = {}
+        # "local" keeps fan-out in this process, "redis" relays it over pub/sub
+        self.mode = mode or settings.ws_broadcast_mode
+        self._redis = redis_client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._has_rooms: Optional[asyncio.Event] = None
+
+    @property
+    def distributed(self) -> bool:
+        return self.mode == "redis"
+
+    @property
+    def redis(self):
+        return self._redis or database.redis
+
+    @staticmethod
+    def room_channel(room_id: str) -> str:
+        return f"room:{room_id}:broadcast"
+
+    @staticmethod
+    def channel_room(channel: str) -> str:
+        return channel[len("room:"):-len(":broadcast")]
+
+    async def start(self):
+        if not self.distributed or self._pubsub is not None:
+            return
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._has_rooms = asyncio.Event()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.reset()
+            self._pubsub = None
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str) -> Connection:
         await websocket.accept()
-        self.active_connections.setdefault(room_id, []).append(websocket)
-        self.user_connections[user_id] = websocket
+        connection = Connection(websocket, user_id)
+        connection.start()
+        self.user_connections.setdefault(user_id, set()).add(connection)
+        return connection
 
-    async def disconnect(self, websocket: WebSocket, room_id: str, user_id: str):
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
-        if user_id in self.user_connections:
-            del self.user_connections[user_id]
+    async def subscribe(self, connection: Connection, room_id: str):
+        if room_id in connection.rooms:
+            return
+        connection.rooms.add(room_id)
+        connections = self.active_connections.setdefault(room_id, set())
+        connections.add(connection)
+        # Only the first local socket in a room needs a subscription
+        if self.distributed and len(connections) == 1:
+            await self._pubsub.subscribe(self.room_channel(room_id))
+            self._has_rooms.set()
 
+    async def unsubscribe(self, connection: Connection, room_id: str):
+        connection.rooms.discard(room_id)
+        connections = self.active_connections.get(room_id)
+        if not connections or connection not in connections:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.active_connections[room_id]
+            if self.distributed:
+                await self._pubsub.unsubscribe(self.room_channel(room_id))
+                if not self.active_connections:
+                    self._has_rooms.clear()
+
+    async def disconnect(self, connection: Connection):
+        for room_id in list(connection.rooms):
+            await self.unsubscribe(connection, room_id)
+        connections = self.user_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.user_connections[connection.user_id]
+        await connection.close()
+
+    @metrics.timed("broadcast_to_room")
     async def broadcast_to_room(self, message: dict, room_id: str):
-        for ws in self.active_connections.get(room_id, []):
-            await ws.send_json(message)
+        with profiling.stage("fanout"):
+            # Encode once; the same frame goes to Redis and to every local socket
+            frame = encode_frame(message)
+            if self.distributed:
+                # Every subscribed worker, including this one, delivers it locally
+                await self.redis.publish(self.room_channel(room_id), frame)
+                return
+            await self._deliver_local(frame, room_id)
+
+    async def _deliver_local(self, frame: str, room_id: str):
+        # Enqueue only: each connection's writer drains at its own pace
+        start = time.perf_counter()
+        connections = list(self.active_connections.get(room_id, ()))
+        for connection in connections:
+            connection.send(frame)
+        metrics.BROADCAST_DURATION.observe(time.perf_counter() - start)
+        metrics.BROADCAST_FANOUT.observe(len(connections))
+
+    async def _listen(self):
+        while True:
+            await self._has_rooms.wait()
+            try:
+                event = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if event is None or event["type"] != "message":
+                    continue
+                await self._deliver_local(event["data"], self.channel_room(event["channel"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Room broadcast listener failed")
+                await asyncio.sleep(1)
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.user_connections.values())
+
+    def room_count(self) -> int:
+        return len(self.active_connections)
+
+    def queue_depths(self):
+        return [connection.queue.qsize() for connections in self.user_connections.values() for connection in connections]
 
     async def send_personal_message(self, message: dict, user_id: str):
-        ws = self.user_connections.get(user_id)
-        if ws:
-            await ws.send_json(message)
+        frame = encode_frame(message)
+        for connection in list(self.user_connections.get(user_id, ())):
+            connection.send(frame)
 
 manager = ConnectionManager()
 
+# Sampled at scrape time rather than maintained on every connect/send
+metrics.WS_CONNECTIONS.set_function(manager.connection_count)
+metrics.WS_ROOMS.set_function(manager.room_count)
+metrics.WS_QUEUED_FRAMES.set_function(lambda: sum(manager.queue_depths()))
+metrics.WS_MAX_QUEUE_DEPTH.set_function(lambda: max(manager.queue_depths(), default=0))
+
+# Strong references to pending write-behind acknowledgements
+_pending_acks: Set[asyncio.Task] = set()
+
 async def get_connection_manager():
     return manager
 
-async def set_user_online(user_id: str):
-    await redis.set(f"user:{user_id}:online", 1, ex=60)
+async def acknowledge_when_persisted(manager: ConnectionManager, connection: Connection, doc: dict, persisted: asyncio.Future):
+    try:
+        await persisted
+    except Exception:
+        logger.exception("Message %s was broadcast but could not be stored", doc["id"])
+        connection.send_json({"type": "nack", "id": doc["id"], "room_id": doc["room_id"], "error": "Message could not be saved"})
+        await manager.broadcast_to_room({"type": "message_failed", "id": doc["id"], "room_id": doc["room_id"]}, doc["room_id"])
+        return
+    connection.send_json({"type": "ack", "id": doc["id"], "room_id": doc["room_id"]})
+    await RecentHistoryCache.push(doc)
+    NotificationService.dispatch(doc["room_id"], doc["user_id"])
+
+def authenticate(token: str) -> Optional[dict]:
+    payload = decode_access_token(token)
+    if not payload or "sub" not in payload or "username" not in payload:
+        return None
+    return payload
+
+async def handle_message(manager: ConnectionManager, connection: Connection, mongo_db, room_id: str, username: str, data: dict):
+    profile = connection.profile or profiling.sampled()
+    if not profile and not profiling.enabled():
+        await process_message(manager, connection, mongo_db, room_id, username, data)
+        return
+    with profiling.Trace("ws message", profile=profile, room_id=room_id):
+        await process_message(manager, connection, mongo_db, room_id, username, data)
+
+async def process_message(manager: ConnectionManager, connection: Connection, mongo_db, room_id: str, username: str, data: dict):
+    user_id = connection.user_id
+    # Rate limiting
+    with profiling.stage("rate_limit"):
+        allowed = await rate_limiter.is_allowed(user_id)
+    if not allowed:
+        connection.send_json({"error": "Rate limit exceeded", "room_id": room_id})
+        return
+    # Validate and save message
+    try:
+        msg_in = MessageCreate(**data)
+    except Exception as e:
+        connection.send_json({"error": "Invalid message format", "details": str(e), "room_id": room_id})
+        return
+    try:
+        if settings.message_write_mode == "write_behind":
+            doc = await MessageService.build_message(room_id, user_id, username, msg_in)
+        else:
+            saved = await MessageService.create_message(mongo_db, room_id, user_id, username, msg_in)
+    except ValueError as e:
+        connection.send_json({"error": str(e), "room_id": room_id})
+        return
+    if settings.message_write_mode == "write_behind":
+        with profiling.stage("insert"):
+            persisted = message_writer.enqueue(doc)
+        saved = {**doc, "id": str(doc["_id"])}
+        await manager.broadcast_to_room(saved, room_id)
+        task = asyncio.create_task(acknowledge_when_persisted(manager, connection, saved, persisted))
+        _pending_acks.add(task)
+        task.add_done_callback(_pending_acks.discard)
+        return
+    await manager.broadcast_to_room(saved, room_id)
+    NotificationService.dispatch(room_id, user_id)
 
-async def set_user_offline(user_id: str):
-    await redis.delete(f"user:{user_id}:online")
+@router.websocket("/ws")
+async def multiplexed_websocket_endpoint(
+    websocket: WebSocket,
+    token: str = Query(...),
+    manager: ConnectionManager = Depends(get_connection_manager),
+    mongo_db=Depends(get_mongo_db)
+):
+    # One socket per user: rooms are joined and left with control frames
+    #   {"type": "subscribe", "room_id": ...} / {"type": "unsubscribe", "room_id": ...}
+    #   {"type": "message", "room_id": ..., "content": ...} / {"type": "heartbeat"}
+    payload = authenticate(token)
+    if payload is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = payload["sub"]
+    username = payload["username"]
+    connection = await manager.connect(websocket, user_id)
+    connection.profile = profiling.requested(websocket.headers.get("x-profile"), websocket.headers.get("x-diagnostics-token"))
+    # Set up inside the try so a Redis failure still releases the connection
+    presence_id = None
+    try:
+        presence_id = await PresenceService.connect(user_id)
+        while True:
+            data = await websocket.receive_json()
+            PresenceService.heartbeat(presence_id)
+            if not isinstance(data, dict):
+                connection.send_json({"error": "Invalid frame"})
+                continue
+            frame_type = data.pop("type", None)
+            room_id = data.pop("room_id", None)
+            if frame_type == "heartbeat":
+                continue
+            if not isinstance(room_id, str):
+                connection.send_json({"error": "room_id is required", "type": frame_type})
+                continue
+            if frame_type == "subscribe":
+                if not await MembershipIndex.is_member(room_id, user_id):
+                    connection.send_json({"error": "Not a member of this room", "room_id": room_id})
+                    continue
+                await manager.subscribe(connection, room_id)
+                connection.send_json({"type": "subscribed", "room_id": room_id})
+            elif frame_type == "unsubscribe":
+                await manager.unsubscribe(connection, room_id)
+                connection.send_json({"type": "unsubscribed", "room_id": room_id})
+            elif frame_type == "message":
+                if room_id not in connection.rooms:
+                    connection.send_json({"error": "Not subscribed to this room", "room_id": room_id})
+                    continue
+                await handle_message(manager, connection, mongo_db, room_id, username, data)
+            else:
+                connection.send_json({"error": "Unknown frame type", "type": frame_type})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await manager.disconnect(connection)
+        if presence_id is not None:
+            await PresenceService.disconnect(presence_id)
 
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(
@@ -56,39 +302,42 @@ async def websocket_endpoint(
     room_id: str,
     token: str = Query(...),
     manager: ConnectionManager = Depends(get_connection_manager),
-    session: AsyncSession = Depends(get_pg_session),
     mongo_db=Depends(get_mongo_db)
 ):
     # Authenticate user from token
-    payload = decode_access_token(token)
-    if not payload or "sub" not in payload or "username" not in payload:
+    payload = authenticate(token)
+    if payload is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
     user_id = payload["sub"]
     username = payload["username"]
-    # Check room membership
-    is_member = await RoomService.join_room(session, UUID(room_id), UUID(user_id))
-    if not is_member:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
-    await manager.connect(websocket, room_id, user_id)
-    await set_user_online(user_id)
+    # Check room membership, joining on first connect as before. The session
+    # lives for the handshake only, not for the life of the socket
+    async with database.AsyncSessionLocal() as session:
+        if not await MembershipIndex.is_member(room_id, user_id, session):
+            try:
+                membership = await RoomService.join_room(session, UUID(room_id), UUID(user_id))
+            except ValueError:
+                membership = None
+            if not membership or not membership.is_active:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+    connection = await manager.connect(websocket, user_id)
+    connection.profile = profiling.requested(websocket.headers.get("x-profile"), websocket.headers.get("x-diagnostics-token"))
+    # Set up inside the try so a Redis failure still releases the connection
+    presence_id = None
     try:
+        await manager.subscribe(connection, room_id)
+        presence_id = await PresenceService.connect(user_id)
         while True:
             data = await websocket.receive_json()
-            # Rate limiting
-            allowed = await rate_limiter.is_allowed(user_id)
-            if not allowed:
-                await websocket.send_json({"error": "Rate limit exceeded"})
+            PresenceService.heartbeat(presence_id)
+            if isinstance(data, dict) and data.get("type") == "heartbeat":
                 continue
-            # Validate and save message
-            try:
-                msg_in = MessageCreate(**data)
-            except Exception as e:
-                await websocket.send_json({"error": "Invalid message format", "details": str(e)})
-                continue
-            saved = await MessageService.create_message(mongo_db, room_id, user_id, username, msg_in)
-            await manager.broadcast_to_room(saved, room_id)
+            await handle_message(manager, connection, mongo_db, room_id, username, data)
     except WebSocketDisconnect:
-        await manager.disconnect(websocket, room_id, user_id)
-        await set_user_offline(user_id) 
\ No newline at end of file
+        pass
+    finally:
+        await manager.disconnect(connection)
+        if presence_id is not None:
+            await PresenceService.disconnect(presence_id)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import sys
+from app.core import database
+
+async def rebuild_membership_index():
+    from app.services.membership_index import MembershipIndex
+    await database.redis_connect()
+    try:
+        async with database.AsyncSessionLocal() as session:
+            count = await MembershipIndex.rebuild(session)
+        print(f"Indexed {count} room memberships")
+    finally:
+        await database.redis.close()
+
+async def ensure_indexes(drop_extra: bool = False):
+    from app.core import indexes
+    await database.mongo_connect()
+    try:
+        mongo_db = database.get_mongo_db()
+        if drop_extra:
+            for name in await indexes.drop_extra_indexes(mongo_db):
+                print(f"Dropped {name}")
+        await indexes.ensure_indexes(mongo_db)
+        print("Indexes are up to date")
+    finally:
+        database.mongo_client.close()
+
+async def check_indexes():
+    from app.core import indexes
+    await database.mongo_connect()
+    try:
+        mongo_db = database.get_mongo_db()
+        failed = False
+        for collection, diff in (await indexes.diff_indexes(mongo_db)).items():
+            for name in diff["missing"]:
+                print(f"missing: {collection}.{name}")
+                failed = True
+            for name in diff["extra"]:
+                print(f"extra: {collection}.{name}")
+        for name in await indexes.find_collection_scans(mongo_db):
+            print(f"collection scan: {name}")
+            failed = True
+        return 1 if failed else 0
+    finally:
+        database.mongo_client.close()
+
+COMMANDS = {
+    "rebuild-membership-index": rebuild_membership_index,
+    "ensure-indexes": ensure_indexes,
+    "check-indexes": check_indexes,
+}
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--drop-extra", action="store_true", help="ensure-indexes: drop indexes that are not declared")
+    args = parser.parse_args()
+    kwargs = {"drop_extra": True} if args.drop_extra and args.command == "ensure-indexes" else {}
+    sys.exit(asyncio.run(COMMANDS[args.command](**kwargs)) or 0)
+
+if __name__ == "__main__":
+    main()
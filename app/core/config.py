@@ -11,9 +11,45 @@ class Settings(BaseSettings):
     secret_key: str = "your-secret-key-here"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Build the current user from signed token claims without a lookup;
+    # revocation then only takes effect when the token expires
+    auth_trust_token_claims: bool = False
+    principal_cache_size: int = 10000
+    principal_cache_ttl: int = 60
+    # bcrypt runs on a dedicated pool; logins beyond workers + queue get a 503
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 64
+    
+    # Connection pools, sized per worker process
+    pg_pool_size: int = 10
+    pg_max_overflow: int = 10
+    pg_pool_timeout: float = 30.0
+    pg_pool_recycle: int = 1800  # seconds, -1 never recycles
+    pg_pool_pre_ping: bool = False
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_connect_timeout_ms: int = 20000
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0  # wait for a free connection, then error
+    redis_socket_timeout: Optional[float] = None
+    # Pings connections idle this many seconds before reuse (0 disables)
+    redis_health_check_interval: int = 30
     
     # MongoDB Database
     mongodb_name: str = "chat_db"
+    # Apply app.core.indexes at startup; otherwise run `python -m app.cli ensure-indexes`
+    mongo_create_indexes_on_startup: bool = True
+    # "direct" awaits insert_one per message; "write_behind" broadcasts first and
+    # batches inserts, acknowledging to the sender only once stored
+    message_write_mode: str = "direct"
+    message_batch_size: int = 500
+    message_batch_interval_ms: int = 20
+    # Newest messages per room kept in Redis to serve the first history page
+    history_cache_enabled: bool = True
+    history_cache_size: int = 200
+    history_cache_ttl: int = 3600
     
     # Redis Settings
     redis_expire_seconds: int = 3600
@@ -21,9 +57,56 @@ class Settings(BaseSettings):
     # Rate Limiting
     rate_limit_requests: int = 100
     rate_limit_window: int = 60
+    # Reject keys Redis already refused locally until their retry-after passes
+    rate_limit_local_prefilter: bool = True
+    rate_limit_local_cache_size: int = 100000
+    
+    # WebSocket broadcast: "local" delivers in-process only, "redis" fans out
+    # through per-room pub/sub channels so every worker sees every message
+    ws_broadcast_mode: str = "local"
+    # Per-connection outbound queue and what to do when a client can't keep up
+    ws_send_queue_size: int = 256
+    ws_overflow_policy: str = "drop_oldest"  # drop_oldest, disconnect
+    
+    # Presence: clients heartbeat at least every presence_ttl / 2 seconds and
+    # heartbeats are written to Redis in batches every presence_flush_interval
+    presence_ttl: int = 60
+    presence_flush_interval: int = 10
+    
+    # Moderation word list, one term per line; reloaded when the file changes
+    banned_words_file: Optional[str] = None
+    
+    # Room membership index (Redis sets with an in-process LRU in front)
+    membership_cache_size: int = 100000
+    membership_cache_ttl: int = 30
     
     # File Upload
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    upload_dir: str = "uploads"
+    upload_chunk_size: int = 64 * 1024
+    # Longest edge of generated image derivatives, in pixels
+    thumbnail_size: int = 320
+    preview_size: int = 48
+    # e.g. "/protected-uploads" to hand file bodies to nginx via X-Accel-Redirect
+    attachment_accel_redirect_prefix: Optional[str] = None
+    
+    # Prometheus /metrics plus request, datastore and hot-path timings
+    metrics_enabled: bool = True
+    # Requests and WebSocket messages slower than this keep a per-stage
+    # breakdown (0 disables); the slowest N are listed under /diagnostics
+    slow_request_threshold_ms: int = 500
+    slow_request_capture_size: int = 20
+    # Fraction run under cProfile; X-Profile plus the diagnostics token forces it
+    profile_sample_rate: float = 0.0
+    
+    # /health/ready serves the result of background probes run every interval,
+    # each bounded by the timeout; results older than stale_after count as down
+    health_check_interval: float = 5.0
+    health_check_timeout: float = 2.0
+    health_stale_after: float = 30.0
+    
+    # Shared secret for /diagnostics (X-Diagnostics-Token); unset disables it
+    diagnostics_token: Optional[str] = None
     
     class Config:
         env_file = ".env"
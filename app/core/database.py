@@ -1,15 +1,32 @@
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 from motor.motor_asyncio import AsyncIOMotorClient
 import aioredis
 from .config import settings
+from . import metrics
+from .pools import InstrumentedAsyncPool, InstrumentedRedisPool, MongoPoolStats
 
 # PostgreSQL (SQLAlchemy async)
 DATABASE_URL = settings.postgresql_url
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    future=True,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=settings.pg_pool_size,
+    max_overflow=settings.pg_max_overflow,
+    pool_timeout=settings.pg_pool_timeout,
+    pool_recycle=settings.pg_pool_recycle,
+    pool_pre_ping=settings.pg_pool_pre_ping,
+)
 AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+if settings.metrics_enabled:
+    metrics.instrument_engine(engine)
 
+# One session per request: auth, route and services all depend on this and
+# FastAPI resolves it once, so a request checks out at most one connection
 async def get_pg_session():
     async with AsyncSessionLocal() as session:
         yield session
@@ -17,19 +34,31 @@ async def get_pg_session():
 async def pg_health_check():
     try:
         async with engine.connect() as conn:
-            await conn.execute("SELECT 1")
+            await conn.execute(text("SELECT 1"))
         return True
     except Exception:
         return False
 
 # MongoDB (Motor)
 mongo_client: AsyncIOMotorClient = None
+mongo_pool_stats = MongoPoolStats()
 def get_mongo_client():
     return mongo_client
 
 async def mongo_connect():
     global mongo_client
-    mongo_client = AsyncIOMotorClient(settings.mongodb_url)
+    listeners = [mongo_pool_stats]
+    if settings.metrics_enabled:
+        listeners.append(metrics.MongoCommandMetrics())
+    mongo_client = AsyncIOMotorClient(
+        settings.mongodb_url,
+        event_listeners=listeners,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+    )
 
 def get_mongo_db():
     return mongo_client[settings.mongodb_name]
@@ -45,7 +74,25 @@ async def mongo_health_check():
 redis = None
 async def redis_connect():
     global redis
-    redis = await aioredis.from_url(settings.redis_url, decode_responses=True)
+    client_class = metrics.InstrumentedRedis if settings.metrics_enabled else aioredis.Redis
+    pool = InstrumentedRedisPool.from_url(
+        settings.redis_url,
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+    )
+    redis = await client_class(connection_pool=pool)
+
+# Lua scripts registered once per client and invoked by SHA afterwards
+_scripts = {}
+def get_redis_script(source: str):
+    script = _scripts.get(source)
+    if script is None or script.registered_client is not redis:
+        script = redis.register_script(source)
+        _scripts[source] = script
+    return script
 
 async def redis_health_check():
     try:
@@ -54,6 +101,23 @@ async def redis_health_check():
     except Exception:
         return False
 
+def pool_stats() -> dict:
+    stats = {}
+    if isinstance(engine.pool, InstrumentedAsyncPool):
+        stats["postgres"] = engine.pool.stats()
+    if mongo_client is not None:
+        stats["mongo"] = mongo_pool_stats.stats(settings.mongo_max_pool_size)
+    if redis is not None and isinstance(redis.connection_pool, InstrumentedRedisPool):
+        stats["redis"] = redis.connection_pool.stats()
+    return stats
+
+def _pool_gauge(store: str, state: str):
+    return lambda: pool_stats().get(store, {}).get(state, 0)
+
+for _store in ("postgres", "mongo", "redis"):
+    for _state in ("in_use", "idle", "waiters"):
+        metrics.POOL_CONNECTIONS.labels(_store, _state).set_function(_pool_gauge(_store, _state))
+
 async def connect():
     await mongo_connect()
     await redis_connect()
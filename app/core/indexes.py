@@ -0,0 +1,112 @@
+import logging
+from datetime import datetime
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Every index the services rely on, keyed by collection
+MONGO_INDEXES: Dict[str, List[IndexModel]] = {
+    "messages": [
+        IndexModel([("room_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("room_id", ASCENDING), ("content", TEXT)], name="room_content_text"),
+        # Preview back-fill looks messages up by attachment; most have none
+        IndexModel([("file_url", ASCENDING)], name="file_url", partialFilterExpression={"file_url": {"$type": "string"}}),
+    ],
+    "reports": [
+        IndexModel([("room_id", ASCENDING), ("type", ASCENDING)], name="room_type"),
+    ],
+}
+
+# Indexes earlier releases created that conflict with the ones above: MongoDB
+# allows one text index per collection, and the old search used content only
+LEGACY_INDEXES: Dict[str, List[str]] = {
+    "messages": ["content_text"],
+}
+
+# The query shapes issued by the services, used to verify none of them scans
+_sample_room = "index-check"
+_sample_time = datetime.utcnow()
+_sample_id = ObjectId()
+INDEXED_QUERIES = {
+    "messages.latest": lambda db: db.messages.find({"room_id": _sample_room}).sort([("created_at", -1), ("_id", -1)]).limit(51),
+    "messages.before": lambda db: db.messages.find({
+        "room_id": _sample_room,
+        "$or": [{"created_at": {"$lt": _sample_time}}, {"created_at": _sample_time, "_id": {"$lt": _sample_id}}],
+    }).sort([("created_at", -1), ("_id", -1)]).limit(51),
+    "messages.after": lambda db: db.messages.find({
+        "room_id": _sample_room,
+        "$or": [{"created_at": {"$gt": _sample_time}}, {"created_at": _sample_time, "_id": {"$gt": _sample_id}}],
+    }).sort([("created_at", 1), ("_id", 1)]).limit(51),
+    "messages.search": lambda db: db.messages.find({"$and": [{"room_id": _sample_room}, {"$text": {"$search": "hello"}}]}).limit(50),
+    "messages.file_url": lambda db: db.messages.find({"file_url": "/uploads/00/sample.png", "metadata.thumbnail_url": {"$exists": False}}),
+    "reports.room": lambda db: db.reports.find({"$or": [{"type": "message", "room_id": _sample_room}, {"type": "user", "room_id": _sample_room}]}),
+}
+
+async def drop_legacy_indexes(mongo_db: AsyncIOMotorDatabase) -> List[str]:
+    dropped = []
+    for collection, names in LEGACY_INDEXES.items():
+        existing = await mongo_db[collection].index_information()
+        for name in names:
+            if name not in existing:
+                continue
+            try:
+                await mongo_db[collection].drop_index(name)
+            except OperationFailure:
+                # Another worker dropped it first
+                continue
+            logger.info("Dropped legacy index %s.%s", collection, name)
+            dropped.append(f"{collection}.{name}")
+    return dropped
+
+async def ensure_indexes(mongo_db: AsyncIOMotorDatabase):
+    await drop_legacy_indexes(mongo_db)
+    for collection, models in MONGO_INDEXES.items():
+        for model in models:
+            # One command per index, so a conflict on one cannot block the others
+            try:
+                await mongo_db[collection].create_indexes([model])
+            except OperationFailure:
+                logger.exception(
+                    "Could not create index %s.%s; run `python -m app.cli check-indexes`", collection, model.document["name"]
+                )
+    logger.info("Ensured MongoDB indexes on %s", ", ".join(MONGO_INDEXES))
+
+async def diff_indexes(mongo_db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, List[str]]]:
+    report = {}
+    for collection, models in MONGO_INDEXES.items():
+        declared = {model.document["name"] for model in models}
+        existing = set(await mongo_db[collection].index_information()) - {"_id_"}
+        report[collection] = {
+            "missing": sorted(declared - existing),
+            "extra": sorted(existing - declared),
+        }
+    return report
+
+async def drop_extra_indexes(mongo_db: AsyncIOMotorDatabase) -> List[str]:
+    dropped = []
+    for collection, diff in (await diff_indexes(mongo_db)).items():
+        for name in diff["extra"]:
+            await mongo_db[collection].drop_index(name)
+            dropped.append(f"{collection}.{name}")
+    return dropped
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+async def find_collection_scans(mongo_db: AsyncIOMotorDatabase) -> List[str]:
+    scans = []
+    for name, build in INDEXED_QUERIES.items():
+        explain = await build(mongo_db).explain()
+        if _has_collscan(explain.get("queryPlanner", explain)):
+            scans.append(name)
+    return scans
@@ -0,0 +1,141 @@
+import time
+from functools import wraps
+from typing import Callable
+import aioredis
+from aioredis.client import Pipeline
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from sqlalchemy import event
+from app.core.config import settings
+
+# Most datastore and hot-path calls land between 0.5 ms and 50 ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "chat_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+DATASTORE_CALL_DURATION = Histogram(
+    "chat_datastore_call_duration_seconds", "Postgres statements, Mongo commands and Redis commands",
+    ["store", "operation"], buckets=LATENCY_BUCKETS,
+)
+DATASTORE_ERRORS = Counter("chat_datastore_errors_total", "Failed datastore calls", ["store", "operation"])
+OPERATION_DURATION = Histogram(
+    "chat_operation_duration_seconds", "Hot-path operations such as create_message and broadcast_to_room",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+BROADCAST_FANOUT = Histogram("chat_broadcast_fanout", "Local sockets a room frame was queued to", buckets=FANOUT_BUCKETS)
+BROADCAST_DURATION = Histogram("chat_broadcast_duration_seconds", "Time to queue a room frame to every local socket", buckets=LATENCY_BUCKETS)
+WS_CONNECTIONS = Gauge("chat_ws_connections", "Open WebSocket connections in this worker")
+WS_ROOMS = Gauge("chat_ws_rooms", "Rooms with at least one local subscriber in this worker")
+WS_QUEUED_FRAMES = Gauge("chat_ws_queued_frames", "Frames waiting in outbound queues in this worker")
+WS_MAX_QUEUE_DEPTH = Gauge("chat_ws_max_queue_depth", "Deepest outbound queue in this worker")
+WS_DROPPED_FRAMES = Counter("chat_ws_dropped_frames_total", "Frames dropped from full outbound queues")
+WS_EVICTIONS = Counter("chat_ws_slow_consumer_evictions_total", "Sockets closed because their queue was full")
+POOL_CHECKOUT_WAIT = Histogram(
+    "chat_pool_checkout_wait_seconds", "Wait for a pooled connection", ["store"], buckets=LATENCY_BUCKETS,
+)
+POOL_CONNECTIONS = Gauge("chat_pool_connections", "Pooled connections in this worker", ["store", "state"])
+DEPENDENCY_UP = Gauge("chat_dependency_up", "Last background health probe succeeded", ["dependency"])
+DEPENDENCY_PROBE_LATENCY = Gauge("chat_dependency_probe_seconds", "Latency of the last health probe", ["dependency"])
+HISTORY_CACHE_LOOKUPS = Counter("chat_history_cache_lookups_total", "Recent-history cache reads by result", ["result"])
+RATE_LIMIT_REJECTIONS = Counter("chat_rate_limit_rejections_total", "Rejected rate-limit checks", ["source"])
+
+# labels() takes a lock and builds a key on every call; hot paths reuse children
+_children = {}
+def child(metric, *labels):
+    key = (metric, labels)
+    series = _children.get(key)
+    if series is None:
+        series = _children[key] = metric.labels(*labels)
+    return series
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def timed(operation: str):
+    # Records an async function's duration under chat_operation_duration_seconds
+    def decorator(func: Callable):
+        if not settings.metrics_enabled:
+            return func
+        histogram = OPERATION_DURATION.labels(operation)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def observe_datastore(store: str, operation: str, elapsed: float, failed: bool = False):
+    child(DATASTORE_CALL_DURATION, store, operation).observe(elapsed)
+    if failed:
+        child(DATASTORE_ERRORS, store, operation).inc()
+
+# Postgres: statement timings from SQLAlchemy cursor events
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_start"].pop()
+        observe_datastore("postgres", statement_operation(statement), time.perf_counter() - start)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_start") if conn is not None else None
+        if starts:
+            statement = exception_context.statement or ""
+            observe_datastore("postgres", statement_operation(statement), time.perf_counter() - starts.pop(), failed=True)
+
+def statement_operation(statement: str) -> str:
+    return statement.lstrip().partition(" ")[0].upper() or "UNKNOWN"
+
+# MongoDB: pymongo reports each command's server round trip
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe_datastore("mongo", event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        observe_datastore("mongo", event.command_name, event.duration_micros / 1e6, failed=True)
+
+# Redis: every command, including EVALSHA for the Lua scripts, goes through
+# execute_command; pipelines are timed as one round trip
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            observe_datastore("redis", "PIPELINE", time.perf_counter() - start, failed)
+
+class InstrumentedRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            observe_datastore("redis", str(args[0]).upper(), time.perf_counter() - start, failed)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
@@ -0,0 +1,149 @@
+import threading
+import time
+from aioredis import BlockingConnectionPool
+from pymongo import monitoring
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core import metrics
+
+class WaitStats:
+    # Time spent waiting to check a connection out of a pool
+    def __init__(self, store: str):
+        self.histogram = metrics.POOL_CHECKOUT_WAIT.labels(store)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.histogram.observe(elapsed)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.count,
+            "wait_avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "wait_max_ms": round(self.max * 1000, 3),
+        }
+
+# Postgres: QueuePool already counts connections; this adds waiters and wait time
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.wait_stats = WaitStats("postgres")
+
+    def _do_get(self):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.waiting -= 1
+            self.wait_stats.record(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(0, self.overflow()),
+            "waiters": self.waiting,
+            **self.wait_stats.as_dict(),
+        }
+
+# MongoDB: pymongo publishes pool events from whichever thread checks out
+class MongoPoolStats(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiters = 0
+        self.checkout_failures = 0
+        self.wait_stats = WaitStats("mongo")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiters += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiters -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiters -= 1
+            self.in_use += 1
+            # pymongo >= 4.7 reports how long the checkout took
+            duration = getattr(event, "duration", None)
+            if duration is not None:
+                self.wait_stats.record(duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self, max_size: int) -> dict:
+        return {
+            "size": max_size,
+            "open": self.open,
+            "in_use": self.in_use,
+            "idle": max(0, self.open - self.in_use),
+            "waiters": self.waiters,
+            "checkout_failures": self.checkout_failures,
+            **self.wait_stats.as_dict(),
+        }
+
+# Redis: a bounded pool that waits for a free connection instead of opening more
+class InstrumentedRedisPool(BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.wait_stats = WaitStats("redis")
+
+    async def get_connection(self, command_name, *keys, **options):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        finally:
+            self.waiting -= 1
+            self.wait_stats.record(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        # Free slots hold None until a connection is first made for them
+        idle = sum(1 for connection in self.pool._queue if connection is not None)
+        return {
+            "size": self.max_connections,
+            "open": len(self._connections),
+            "in_use": len(self._connections) - idle,
+            "idle": idle,
+            "waiters": self.waiting,
+            **self.wait_stats.as_dict(),
+        }
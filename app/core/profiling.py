@@ -0,0 +1,135 @@
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+
+# Trace of the request or WebSocket frame running in the current task
+_current: ContextVar[Optional["Trace"]] = ContextVar("profiling_trace", default=None)
+# cProfile hooks the whole thread, so only one profile runs at a time
+_profiler_lock = threading.Lock()
+
+def requested(profile_header: Optional[str], token: Optional[str]) -> bool:
+    # Explicit profiling needs X-Profile plus the diagnostics token
+    if not profile_header or not token or not settings.diagnostics_token:
+        return False
+    return secrets.compare_digest(token, settings.diagnostics_token)
+
+def sampled() -> bool:
+    return settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate
+
+def enabled() -> bool:
+    return settings.slow_request_threshold_ms > 0 or settings.profile_sample_rate > 0
+
+class Trace:
+    def __init__(self, name: str, profile: bool = False, **details):
+        self.name = name
+        self.details = details
+        self.stages = {}
+        self.profile = profile
+        self._profiler: Optional[cProfile.Profile] = None
+        self._token = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        if self.profile and _profiler_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        report = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            _profiler_lock.release()
+            report = render_profile(self._profiler)
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.details["error"] = exc_type.__name__
+        profile_store.record(self, elapsed, report)
+        return False
+
+class _Stage:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            stages = self.trace.stages
+            stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+def stage(name: str) -> _Stage:
+    # Attributes time to a named stage of the current trace; a no-op outside one
+    return _Stage(name)
+
+def render_profile(profiler: cProfile.Profile, limit: int = 40) -> str:
+    # The profile covers every task the loop ran meanwhile, not only this one
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+class ProfileStore:
+    def __init__(self, size: int):
+        self.size = size
+        # Min-heap of the slowest traces over the threshold, plus recent profiles
+        self._slowest = []
+        self._profiles = deque(maxlen=size)
+        self._seq = itertools.count()
+
+    def record(self, trace: Trace, elapsed: float, report: Optional[str]):
+        slow = settings.slow_request_threshold_ms > 0 and elapsed * 1000 >= settings.slow_request_threshold_ms
+        if not slow and report is None:
+            return
+        stages = {name: round(seconds * 1000, 3) for name, seconds in trace.stages.items()}
+        stages["other"] = round(max(0.0, elapsed * 1000 - sum(stages.values())), 3)
+        entry = {
+            "name": trace.name,
+            "at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "stages_ms": stages,
+            **trace.details,
+        }
+        if report is not None:
+            entry["profile"] = report
+            self._profiles.append(entry)
+        if slow:
+            item = (elapsed, next(self._seq), entry)
+            if len(self._slowest) < self.size:
+                heapq.heappush(self._slowest, item)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def snapshot(self) -> dict:
+        return {
+            "threshold_ms": settings.slow_request_threshold_ms,
+            "sample_rate": settings.profile_sample_rate,
+            "slowest": [entry for _, _, entry in sorted(self._slowest, key=lambda item: item[0], reverse=True)],
+            "profiles": list(reversed(self._profiles)),
+        }
+
+    def clear(self):
+        self._slowest.clear()
+        self._profiles.clear()
+
+profile_store = ProfileStore(settings.slow_request_capture_size)
@@ -1,10 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.core import profiling
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 from typing import Optional
+from uuid import UUID
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -17,6 +23,31 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop;
+# password_hash_workers caps concurrency and work beyond the queue is refused
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_hash_pending = 0
+
+class PasswordHashingBusy(Exception):
+    pass
+
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_workers + settings.password_hash_queue_size:
+        raise PasswordHashingBusy()
+    _hash_pending += 1
+    try:
+        with profiling.stage("password_hash"):
+            return await asyncio.get_running_loop().run_in_executor(_hash_executor, partial(func, *args))
+    finally:
+        _hash_pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
 # JWT
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -26,6 +57,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+def user_claims(user) -> dict:
+    return {
+        "sub": str(user.id),
+        "username": user.username,
+        "active": user.is_active,
+        "tv": user.token_version or 0,
+    }
+
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
@@ -35,23 +74,60 @@ def decode_access_token(token: str):
 
 # Dependency to get current user from token (to be used in endpoints)
 from app.models.user import User
+from app.schemas.user import Principal
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import AsyncSessionLocal
+from app.core.database import AsyncSessionLocal, get_pg_session
 from sqlalchemy.future import select
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    payload = decode_access_token(token)
-    if payload is None or "sub" not in payload:
-        raise credentials_exception
-    user_id = payload["sub"]
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.id == user_id))
-        user = result.scalars().first()
-        if user is None:
+_principal_cache = TTLCache(settings.principal_cache_size, settings.principal_cache_ttl)
+
+def cache_principal(user: User) -> Principal:
+    principal = Principal.from_orm(user)
+    _principal_cache.set(str(user.id), principal)
+    return principal
+
+async def load_principal(user_id: str, session: Optional[AsyncSession] = None) -> Optional[Principal]:
+    principal = _principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    try:
+        uid = UUID(user_id)
+    except ValueError:
+        return None
+    query = select(User).where(User.id == uid)
+    if session is not None:
+        user = (await session.execute(query)).scalars().first()
+    else:
+        async with AsyncSessionLocal() as own_session:
+            user = (await own_session.execute(query)).scalars().first()
+    if user is None:
+        return None
+    return cache_principal(user)
+
+# Shares the request's session (FastAPI caches get_pg_session per request)
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_pg_session)):
+    with profiling.stage("auth"):
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        payload = decode_access_token(token)
+        if payload is None or "sub" not in payload:
+            raise credentials_exception
+        user_id = payload["sub"]
+        if settings.auth_trust_token_claims and "username" in payload and "tv" in payload:
+            principal = Principal(id=user_id, username=payload["username"], is_active=payload.get("active", True), token_version=payload["tv"])
+            # A locally known newer record still revokes the token early
+            known = _principal_cache.get(user_id)
+            if known is not None and (known.token_version > principal.token_version or not known.is_active):
+                raise credentials_exception
+        else:
+            principal = await load_principal(user_id, session)
+            if principal is None:
+                raise credentials_exception
+            if payload.get("tv", principal.token_version) != principal.token_version:
+                raise credentials_exception
+        if not principal.is_active:
             raise credentials_exception
-        return user 
\ No newline at end of file
+        return principal
\ No newline at end of file
@@ -1,29 +1,56 @@
 from fastapi import FastAPI
 from app.core import database
 from contextlib import asynccontextmanager
-from app.api import auth, rooms, messages
-from fastapi.staticfiles import StaticFiles
-import os
+from app.api import auth, rooms, messages, websocket, files, diagnostics, health
+from app.core import indexes
+from app.core.config import settings
+from app.utils.middleware import BodySizeLimitMiddleware, MetricsMiddleware, ProfilingMiddleware
+from app.core import metrics
+from app.core.security import PasswordHashingBusy
+from app.services.presence_service import PresenceService
+from app.services.message_writer import message_writer
+from app.services.health_service import HealthService
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
+    if settings.mongo_create_indexes_on_startup:
+        await indexes.ensure_indexes(database.get_mongo_db())
+    await websocket.manager.start()
+    PresenceService.start()
+    await HealthService.start()
     yield
+    await HealthService.stop()
+    await PresenceService.stop()
+    await websocket.manager.stop()
+    await message_writer.close()
     await database.disconnect()
 
 app = FastAPI(title="Distributed Chat API", lifespan=lifespan)
 
-# Serve uploaded files
-UPLOAD_DIR = os.path.abspath("uploads")
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Multipart framing adds a little on top of the file itself
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=settings.max_file_size + 64 * 1024, paths=("/api/messages/upload",))
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse({"detail": "Too many concurrent logins, retry shortly"}, status_code=503, headers={"Retry-After": "1"})
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(rooms.router, prefix="/api/rooms", tags=["rooms"])
 app.include_router(messages.router, prefix="/api/messages", tags=["messages"])
+app.include_router(websocket.router, prefix="/api", tags=["websocket"])
+# Serve uploaded files
+app.include_router(files.router, tags=["files"])
+app.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
+app.include_router(health.router, tags=["health"])
 
-@app.get("/health")
-async def health():
-    pg = await database.pg_health_check()
-    mongo = await database.mongo_health_check()
-    redis = await database.redis_health_check()
-    return {"postgres": pg, "mongodb": mongo, "redis": redis} 
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
@@ -1,11 +1,9 @@
 import uuid
 from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
-
-Base = declarative_base()
+from app.models.user import Base
 
 class Room(Base):
     __tablename__ = "rooms"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 import datetime
@@ -15,5 +15,7 @@ class User(Base):
     hashed_password = Column(String(128), nullable=False)
     full_name = Column(String(128), nullable=True)
     is_active = Column(Boolean, default=True)
+    # Bumped on password change/deactivation to revoke previously issued tokens
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow) 
\ No newline at end of file
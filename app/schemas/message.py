@@ -26,4 +26,10 @@ class MessageResponse(BaseModel):
     edited: bool
     edited_at: Optional[datetime]
     created_at: datetime
-    metadata: Optional[Dict] = None 
\ No newline at end of file
+    metadata: Optional[Dict] = None
+
+class MessagePage(BaseModel):
+    messages: List[MessageResponse]
+    # next_cursor pages towards older messages, prev_cursor towards newer ones
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
\ No newline at end of file
@@ -30,4 +30,7 @@ class RoomMembershipResponse(BaseModel):
     user_id: UUID
     joined_at: datetime.datetime
     role: str
-    is_active: bool 
\ No newline at end of file
+    is_active: bool
+
+    class Config:
+        orm_mode = True
@@ -25,6 +25,15 @@ class UserResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class Principal(BaseModel):
+    id: UUID
+    username: str
+    is_active: bool
+    token_version: int = 0
+
+    class Config:
+        orm_mode = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer" 
\ No newline at end of file
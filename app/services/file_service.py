@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from functools import partial
+from typing import Dict, Optional
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+ALLOWED_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "application/pdf": ".pdf",
+    "text/plain": ".txt",
+}
+
+# Derivatives are generated for these in the background
+IMAGE_TYPES = {"image/png", "image/jpeg"}
+PREVIEW_VARIANTS = {"thumb": "thumbnail_url", "preview": "preview_url"}
+IMAGE_URL = re.compile(r"^/uploads/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.(png|jpg)$")
+
+class FileTooLarge(Exception):
+    pass
+
+def _write_chunk(out, digest, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+def _commit_file(tmp_path: str, final_path: str) -> bool:
+    # Identical content already stored: keep the existing copy
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return True
+
+def _discard(tmp_path: str):
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+class FileService:
+    @staticmethod
+    def relative_path(digest: str, extension: str) -> str:
+        return f"{digest[:2]}/{digest}{extension}"
+
+    @staticmethod
+    def path_for(digest: str, extension: str) -> str:
+        return os.path.join(settings.upload_dir, digest[:2], f"{digest}{extension}")
+
+    @staticmethod
+    def url_for(digest: str, extension: str) -> str:
+        return f"/uploads/{FileService.relative_path(digest, extension)}"
+
+    @staticmethod
+    def variant_path(digest: str, variant: str) -> str:
+        return os.path.join(settings.upload_dir, digest[:2], f"{digest}_{variant}.jpg")
+
+    @staticmethod
+    def variant_urls(digest: str) -> Dict[str, str]:
+        return {key: f"/uploads/{digest[:2]}/{digest}_{variant}.jpg" for variant, key in PREVIEW_VARIANTS.items()}
+
+    @staticmethod
+    def previews_exist(digest: str) -> bool:
+        return all(os.path.exists(FileService.variant_path(digest, variant)) for variant in PREVIEW_VARIANTS)
+
+    @staticmethod
+    async def preview_metadata(file_url: Optional[str]) -> Dict[str, str]:
+        match = IMAGE_URL.match(file_url or "")
+        if not match:
+            return {}
+        digest = match.group("digest")
+        # Only image messages touch the filesystem, and never on the event loop
+        if not await run_in_threadpool(FileService.previews_exist, digest):
+            return {}
+        return FileService.variant_urls(digest)
+
+    @staticmethod
+    async def schedule_previews(digest: str, extension: str):
+        from app.tasks.celery_tasks import generate_attachment_previews
+        # .delay() talks to the broker synchronously, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(generate_attachment_previews.delay, digest, extension))
+
+    @staticmethod
+    def extension_for(content_type: str) -> Optional[str]:
+        return ALLOWED_TYPES.get(content_type)
+
+    @staticmethod
+    async def store_upload(file: UploadFile) -> dict:
+        extension = ALLOWED_TYPES[file.content_type]
+        fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=settings.upload_dir, prefix=".upload-")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = await file.read(settings.upload_chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > settings.max_file_size:
+                        raise FileTooLarge()
+                    # Hash and write off the event loop, one chunk in memory at a time
+                    await run_in_threadpool(_write_chunk, out, digest, chunk)
+            sha256 = digest.hexdigest()
+            created = await run_in_threadpool(_commit_file, tmp_path, FileService.path_for(sha256, extension))
+        except BaseException:
+            await run_in_threadpool(_discard, tmp_path)
+            raise
+        if file.content_type in IMAGE_TYPES and created:
+            await FileService.schedule_previews(sha256, extension)
+        return {
+            "file_url": FileService.url_for(sha256, extension),
+            "sha256": sha256,
+            "size": size,
+            "content_type": file.content_type,
+            "deduplicated": not created,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from app.core import database
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKS = {
+    "postgres": database.pg_health_check,
+    "mongodb": database.mongo_health_check,
+    "redis": database.redis_health_check,
+}
+
+# Latest probe results, refreshed in the background so probes never wait on a datastore
+_results: Dict[str, dict] = {}
+_last_round: Optional[float] = None
+_stopping = False
+_monitor: Optional[asyncio.Task] = None
+
+async def _probe(name: str, check) -> dict:
+    start = time.perf_counter()
+    error = None
+    try:
+        ok = bool(await asyncio.wait_for(check(), settings.health_check_timeout))
+        if not ok:
+            error = "check failed"
+    except asyncio.TimeoutError:
+        ok, error = False, "timeout"
+    except Exception as e:
+        ok, error = False, type(e).__name__
+    latency = time.perf_counter() - start
+    metrics.DEPENDENCY_UP.labels(name).set(1 if ok else 0)
+    metrics.DEPENDENCY_PROBE_LATENCY.labels(name).set(latency)
+    return {
+        "ok": ok,
+        "latency_ms": round(latency * 1000, 3),
+        "error": error,
+        "checked_at": datetime.utcnow().isoformat(),
+    }
+
+class HealthService:
+    @staticmethod
+    async def probe():
+        global _last_round
+        results = await asyncio.gather(*(_probe(name, check) for name, check in CHECKS.items()))
+        for name, result in zip(CHECKS, results):
+            if not result["ok"] and _results.get(name, {}).get("ok", True):
+                logger.warning("Health check %s failing: %s", name, result["error"])
+            _results[name] = result
+        _last_round = time.monotonic()
+
+    @staticmethod
+    def readiness() -> dict:
+        fresh = _last_round is not None and time.monotonic() - _last_round < settings.health_stale_after
+        if _stopping:
+            status = "stopping"
+        elif not fresh:
+            status = "stale" if _last_round is not None else "starting"
+        else:
+            status = "ok" if all(result["ok"] for result in _results.values()) else "degraded"
+        return {"status": status, "ready": status == "ok", "checks": dict(_results)}
+
+    @staticmethod
+    async def _monitor_loop():
+        while True:
+            await asyncio.sleep(settings.health_check_interval)
+            try:
+                await HealthService.probe()
+            except Exception:
+                logger.exception("Health probe round failed")
+
+    @staticmethod
+    async def start():
+        global _monitor, _stopping
+        _stopping = False
+        # One round up front so readiness reflects reality as soon as we serve
+        await HealthService.probe()
+        if _monitor is None:
+            _monitor = asyncio.create_task(HealthService._monitor_loop())
+
+    @staticmethod
+    async def stop():
+        global _monitor, _stopping
+        # Report not-ready while draining so the orchestrator stops routing here
+        _stopping = True
+        if _monitor is None:
+            return
+        _monitor.cancel()
+        try:
+            await _monitor
+        except asyncio.CancelledError:
+            pass
+        _monitor = None
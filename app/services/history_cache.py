@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import orjson
+from bson import ObjectId
+from app.core import database
+from app.core import metrics
+from app.core.config import settings
+from app.utils.serialization import encode_frame
+
+logger = logging.getLogger(__name__)
+
+# Per room: a sorted set of ids scored by created_at in ms (equal scores order
+# by id, matching the (created_at, _id) sort in Mongo), a hash of id -> JSON
+# document, a state key ("complete" when the set holds the room's whole
+# history, "partial" when it holds only the newest messages; absent means cold)
+# and a generation bumped on every write so a fill computed from a stale Mongo
+# read is discarded. Messages arrive out of order across workers and write-behind
+# acks, so each is inserted at its sorted position.
+PUSH_SCRIPT = """
+redis.call('INCR', KEYS[4])
+redis.call('EXPIRE', KEYS[4], ARGV[5])
+local state = redis.call('GET', KEYS[3])
+if not state then
+    return 0
+end
+local score = tonumber(ARGV[2])
+if state == 'partial' then
+    -- Older than everything cached: uncached messages may sit in between
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    if oldest[1] then
+        local oldest_score = tonumber(oldest[2])
+        if score < oldest_score or (score == oldest_score and ARGV[1] < oldest[1]) then
+            return 0
+        end
+    end
+end
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+while redis.call('ZCARD', KEYS[1]) > tonumber(ARGV[4]) do
+    redis.call('HDEL', KEYS[2], redis.call('ZPOPMIN', KEYS[1])[1])
+    redis.call('SET', KEYS[3], 'partial')
+end
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[5])
+end
+return 1
+"""
+
+REPLACE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+REMOVE_SCRIPT = """
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+redis.call('ZREM', KEYS[1], ARGV[1])
+return redis.call('HDEL', KEYS[2], ARGV[1])
+"""
+
+READ_SCRIPT = """
+local state = redis.call('GET', KEYS[3])
+local gen = redis.call('GET', KEYS[4]) or '0'
+if not state then
+    return {false, gen}
+end
+local ids = redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+local result = {state, gen}
+if #ids > 0 then
+    for _, doc in ipairs(redis.call('HMGET', KEYS[2], unpack(ids))) do
+        table.insert(result, doc)
+    end
+end
+return result
+"""
+
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[4]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+for i = 4, #ARGV, 3 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+end
+redis.call('SET', KEYS[3], ARGV[2])
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+return 1
+"""
+
+INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[4])
+redis.call('EXPIRE', KEYS[4], ARGV[1])
+return redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+"""
+
+_stats = {"hits": 0, "misses": 0}
+EPOCH = datetime(1970, 1, 1)
+
+def _record(hit: bool):
+    _stats["hits" if hit else "misses"] += 1
+    metrics.child(metrics.HISTORY_CACHE_LOOKUPS, "hit" if hit else "miss").inc()
+
+def _keys(room_id) -> List[str]:
+    prefix = f"room:{room_id}:history"
+    return [prefix, f"{prefix}:docs", f"{prefix}:state", f"{prefix}:gen"]
+
+def _score(created_at: datetime) -> int:
+    return (created_at - EPOCH) // timedelta(milliseconds=1)
+
+def _decode(raw: str) -> dict:
+    doc = orjson.loads(raw)
+    doc["_id"] = ObjectId(doc["_id"])
+    for field in ("created_at", "edited_at"):
+        if doc.get(field):
+            doc[field] = datetime.fromisoformat(doc[field])
+    return doc
+
+class RecentHistoryCache:
+    @staticmethod
+    def enabled() -> bool:
+        return settings.history_cache_enabled
+
+    @staticmethod
+    async def get_latest(room_id: str, limit: int) -> Tuple[Optional[Tuple[List[dict], bool]], str]:
+        # Returns ((messages, has_more), generation) on a hit, (None, generation) on a miss
+        try:
+            result = await database.get_redis_script(READ_SCRIPT)(keys=_keys(room_id), args=[limit + 1])
+        except Exception:
+            logger.exception("Recent history cache read failed")
+            _record(False)
+            return None, None
+        state, generation, raw_docs = result[0], result[1], result[2:]
+        if state and (state == "complete" or len(raw_docs) > limit) and all(raw_docs):
+            _record(True)
+            return ([_decode(raw) for raw in raw_docs[:limit]], len(raw_docs) > limit), generation
+        _record(False)
+        return None, generation
+
+    @staticmethod
+    async def fill(room_id: str, messages: List[dict], has_more: bool, generation: Optional[str]):
+        if generation is None:
+            return
+        pairs = []
+        for msg in messages[:settings.history_cache_size]:
+            pairs += [str(msg["_id"]), _score(msg["created_at"]), encode_frame(msg)]
+        complete = not has_more and len(messages) <= settings.history_cache_size
+        await RecentHistoryCache._run(
+            FILL_SCRIPT, _keys(room_id), generation, "complete" if complete else "partial", settings.history_cache_ttl, *pairs
+        )
+
+    @staticmethod
+    async def push(doc: dict):
+        await RecentHistoryCache._run(
+            PUSH_SCRIPT, _keys(doc["room_id"]), str(doc["_id"]), _score(doc["created_at"]), encode_frame(doc),
+            settings.history_cache_size, settings.history_cache_ttl,
+        )
+
+    @staticmethod
+    async def replace(doc: dict):
+        keys = _keys(doc["room_id"])
+        await RecentHistoryCache._run(REPLACE_SCRIPT, [keys[1], keys[3]], str(doc["_id"]), encode_frame(doc), settings.history_cache_ttl)
+
+    @staticmethod
+    async def remove(room_id: str, message_id: str):
+        keys = _keys(room_id)
+        await RecentHistoryCache._run(REMOVE_SCRIPT, [keys[0], keys[1], keys[3]], message_id, settings.history_cache_ttl)
+
+    @staticmethod
+    def invalidate_sync(client, room_ids: List[str]):
+        # For sync callers such as Celery tasks; the generation bump also discards
+        # any fill read from Mongo before the change
+        if not settings.history_cache_enabled:
+            return
+        script = client.register_script(INVALIDATE_SCRIPT)
+        for room_id in room_ids:
+            script(keys=_keys(room_id), args=[settings.history_cache_ttl])
+
+    @staticmethod
+    def stats() -> dict:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None}
+
+    @staticmethod
+    async def _run(script: str, keys: List[str], *args):
+        if not settings.history_cache_enabled:
+            return
+        # The cache must never fail a write; a missed update ages out with the TTL
+        try:
+            await database.get_redis_script(script)(keys=keys, args=list(args))
+        except Exception:
+            logger.exception("Recent history cache update failed")
@@ -0,0 +1,151 @@
+import logging
+from typing import Optional, Set
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core import database
+from app.core import metrics
+from app.core.config import settings
+from app.models.room import RoomMembership
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Set once the Redis sets mirror Postgres; until then lookups fall back to SQL
+READY_KEY = "membership:index:ready"
+
+# Positive hits only, so a local ban/leave is visible at once and a remote one
+# within membership_cache_ttl seconds
+_member_cache = TTLCache(settings.membership_cache_size, settings.membership_cache_ttl)
+
+def room_members_key(room_id) -> str:
+    return f"room:{room_id}:members"
+
+def user_rooms_key(user_id) -> str:
+    return f"user:{user_id}:rooms"
+
+def _uuid(value) -> Optional[UUID]:
+    try:
+        return value if isinstance(value, UUID) else UUID(str(value))
+    except ValueError:
+        return None
+
+class MembershipIndex:
+    @staticmethod
+    @metrics.timed("membership_check")
+    async def is_member(room_id, user_id, session: Optional[AsyncSession] = None) -> bool:
+        room_id, user_id = str(room_id), str(user_id)
+        if _member_cache.get((room_id, user_id)):
+            return True
+        pipe = database.redis.pipeline(transaction=False)
+        pipe.sismember(room_members_key(room_id), user_id)
+        pipe.exists(READY_KEY)
+        member, ready = await pipe.execute()
+        if member:
+            _member_cache.set((room_id, user_id), True)
+            return True
+        if ready:
+            return False
+        member = await MembershipIndex._load_membership(room_id, user_id, session)
+        if member:
+            await MembershipIndex.add(room_id, user_id)
+        return member
+
+    @staticmethod
+    async def get_room_members(room_id, session: Optional[AsyncSession] = None) -> Set[str]:
+        pipe = database.redis.pipeline(transaction=False)
+        pipe.smembers(room_members_key(room_id))
+        pipe.exists(READY_KEY)
+        members, ready = await pipe.execute()
+        # Lazily filled sets may be partial, so only a rebuilt index is authoritative
+        if ready:
+            return set(members)
+        room_uuid = _uuid(room_id)
+        if room_uuid is None:
+            return set()
+        rows = await MembershipIndex._fetch(
+            select(RoomMembership.user_id).where(RoomMembership.room_id == room_uuid, RoomMembership.is_active == True), session
+        )
+        return {str(uid) for uid, in rows}
+
+    @staticmethod
+    async def get_user_rooms(user_id, session: Optional[AsyncSession] = None) -> Set[str]:
+        pipe = database.redis.pipeline(transaction=False)
+        pipe.smembers(user_rooms_key(user_id))
+        pipe.exists(READY_KEY)
+        rooms, ready = await pipe.execute()
+        # Lazily filled sets may be partial, so only a rebuilt index is authoritative
+        if ready:
+            return set(rooms)
+        user_uuid = _uuid(user_id)
+        if user_uuid is None:
+            return set()
+        rows = await MembershipIndex._fetch(
+            select(RoomMembership.room_id).where(RoomMembership.user_id == user_uuid, RoomMembership.is_active == True), session
+        )
+        return {str(room_id) for room_id, in rows}
+
+    @staticmethod
+    async def add(room_id, user_id):
+        room_id, user_id = str(room_id), str(user_id)
+        pipe = database.redis.pipeline(transaction=True)
+        pipe.sadd(room_members_key(room_id), user_id)
+        pipe.sadd(user_rooms_key(user_id), room_id)
+        await pipe.execute()
+        _member_cache.set((room_id, user_id), True)
+
+    @staticmethod
+    async def remove(room_id, user_id):
+        room_id, user_id = str(room_id), str(user_id)
+        _member_cache.pop((room_id, user_id))
+        pipe = database.redis.pipeline(transaction=True)
+        pipe.srem(room_members_key(room_id), user_id)
+        pipe.srem(user_rooms_key(user_id), room_id)
+        await pipe.execute()
+
+    @staticmethod
+    async def rebuild(session: AsyncSession) -> int:
+        redis = database.redis
+        # Drop the ready flag first so readers use Postgres while sets are rebuilt
+        await redis.delete(READY_KEY)
+        for pattern in ("room:*:members", "user:*:rooms"):
+            stale = [key async for key in redis.scan_iter(match=pattern, count=1000)]
+            for i in range(0, len(stale), 1000):
+                await redis.delete(*stale[i:i + 1000])
+        result = await session.execute(
+            select(RoomMembership.room_id, RoomMembership.user_id).where(RoomMembership.is_active == True)
+        )
+        count = 0
+        pipe = redis.pipeline(transaction=False)
+        for room_id, user_id in result.all():
+            pipe.sadd(room_members_key(room_id), str(user_id))
+            pipe.sadd(user_rooms_key(user_id), str(room_id))
+            count += 1
+            if count % 1000 == 0:
+                await pipe.execute()
+        pipe.set(READY_KEY, 1)
+        await pipe.execute()
+        _member_cache.clear()
+        logger.info("Rebuilt membership index with %d memberships", count)
+        return count
+
+    @staticmethod
+    async def _load_membership(room_id: str, user_id: str, session: Optional[AsyncSession]) -> bool:
+        room_uuid, user_uuid = _uuid(room_id), _uuid(user_id)
+        if room_uuid is None or user_uuid is None:
+            return False
+        rows = await MembershipIndex._fetch(
+            select(RoomMembership.user_id).where(
+                RoomMembership.room_id == room_uuid, RoomMembership.user_id == user_uuid, RoomMembership.is_active == True
+            ),
+            session,
+        )
+        return bool(rows)
+
+    @staticmethod
+    async def _fetch(query, session: Optional[AsyncSession]):
+        # Reuse the caller's request session; background callers get a short one
+        if session is not None:
+            return (await session.execute(query)).all()
+        async with database.AsyncSessionLocal() as own_session:
+            return (await own_session.execute(query)).all()
@@ -1,23 +1,41 @@
 from app.schemas.message import MessageCreate
+from app.core.config import settings
+from app.core import metrics
+from app.core import profiling
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from datetime import datetime
-from app.core.database import redis, get_pg_session
-from app.models.room import RoomMembership
-from app.tasks.celery_tasks import send_notification
-from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from app.utils.validators import check_message_content
+from app.services.file_service import FileService
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.services.history_cache import RecentHistoryCache
+
+def _object_id(message_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(message_id)
+    except (InvalidId, TypeError):
+        return None
+
+def _bson_now() -> datetime:
+    # BSON dates hold milliseconds; truncate up front so cached, broadcast and
+    # stored copies (and cursors built from any of them) agree
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
 
 class MessageService:
     @staticmethod
-    async def create_message(mongo_db: AsyncIOMotorDatabase, room_id: str, user_id: str, username: str, message_data: MessageCreate) -> dict:
+    async def build_message(room_id: str, user_id: str, username: str, message_data: MessageCreate) -> dict:
         # Content filtering
-        error = check_message_content(message_data.content)
+        with profiling.stage("content_filter"):
+            error = check_message_content(message_data.content)
         if error:
             raise ValueError(error)
-        doc = {
+        # Id assigned here so the message can be broadcast before it is stored
+        return {
+            "_id": ObjectId(),
             "room_id": room_id,
             "user_id": user_id,
             "username": username,
@@ -28,40 +46,68 @@ class MessageService:
             "reactions": [],
             "edited": False,
             "edited_at": None,
-            "created_at": datetime.utcnow(),
-            "metadata": message_data.metadata or {},
+            "created_at": _bson_now(),
+            "metadata": {**(message_data.metadata or {}), **(await FileService.preview_metadata(message_data.file_url))},
         }
-        result = await mongo_db.messages.insert_one(doc)
-        doc["id"] = str(result.inserted_id)
 
-        # Notify offline room members
-        # Get DB session for RoomMembership
-        async with get_pg_session() as session:
-            result = await session.execute(
-                select(RoomMembership).where(RoomMembership.room_id == room_id, RoomMembership.is_active == True)
-            )
-            members = result.scalars().all()
-            for m in members:
-                if str(m.user_id) == user_id:
-                    continue
-                online = await redis.get(f"user:{m.user_id}:online")
-                if not online:
-                    send_notification.delay(str(m.user_id), f"New message in room {room_id}")
+    @staticmethod
+    @metrics.timed("create_message")
+    async def create_message(mongo_db: AsyncIOMotorDatabase, room_id: str, user_id: str, username: str, message_data: MessageCreate) -> dict:
+        doc = await MessageService.build_message(room_id, user_id, username, message_data)
+        with profiling.stage("insert"):
+            await mongo_db.messages.insert_one(doc)
+        doc["id"] = str(doc["_id"])
+        with profiling.stage("history_cache"):
+            await RecentHistoryCache.push(doc)
         return doc
 
     @staticmethod
-    async def get_messages(mongo_db: AsyncIOMotorDatabase, room_id: str, skip: int = 0, limit: int = 50) -> List[dict]:
-        cursor = mongo_db.messages.find({"room_id": room_id}).sort("created_at", -1).skip(skip).limit(limit)
+    async def get_messages(mongo_db: AsyncIOMotorDatabase, room_id: str, limit: int = 50, before: Optional[str] = None, after: Optional[str] = None) -> dict:
+        # The newest page of busy rooms is served from the recent-history cache
+        latest = not before and not after and RecentHistoryCache.enabled() and limit <= settings.history_cache_size
+        if latest:
+            cached, generation = await RecentHistoryCache.get_latest(room_id, limit)
+            if cached is not None:
+                messages, has_more = cached
+                for msg in messages:
+                    msg["id"] = str(msg["_id"])
+                return MessageService._page(messages, has_more, before, after)
+        # Keyset pagination over (created_at, _id): every page is an index seek
+        query = {"room_id": room_id}
+        direction = -1
+        if before:
+            created_at, oid = decode_cursor(before)
+            query["$or"] = [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "_id": {"$lt": oid}}]
+        elif after:
+            created_at, oid = decode_cursor(after)
+            query["$or"] = [{"created_at": {"$gt": created_at}}, {"created_at": created_at, "_id": {"$gt": oid}}]
+            direction = 1
+        cursor = mongo_db.messages.find(query).sort([("created_at", direction), ("_id", direction)]).limit(limit + 1)
         messages = []
         async for msg in cursor:
             msg["id"] = str(msg["_id"])
             messages.append(msg)
-        return messages
+        has_more = len(messages) > limit
+        if latest:
+            await RecentHistoryCache.fill(room_id, messages, has_more, generation)
+        messages = messages[:limit]
+        if after:
+            messages.reverse()
+        return MessageService._page(messages, has_more, before, after)
+
+    @staticmethod
+    def _page(messages: List[dict], has_more: bool, before: Optional[str], after: Optional[str]) -> dict:
+        page = {"messages": messages, "next_cursor": None, "prev_cursor": None}
+        if not messages:
+            return page
+        if has_more or after:
+            page["next_cursor"] = encode_cursor(messages[-1]["created_at"], messages[-1]["_id"])
+        if before or (after and has_more):
+            page["prev_cursor"] = encode_cursor(messages[0]["created_at"], messages[0]["_id"])
+        return page
 
     @staticmethod
     async def search_messages(mongo_db: AsyncIOMotorDatabase, room_id: str, query: str, skip: int = 0, limit: int = 50) -> list:
-        # Ensure text index exists
-        await mongo_db.messages.create_index([("content", "text")])
         cursor = mongo_db.messages.find({
             "$and": [
                 {"room_id": room_id},
@@ -75,52 +121,58 @@ class MessageService:
         return messages
 
     @staticmethod
-    async def edit_message(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str, content: str) -> dict:
-        msg = await mongo_db.messages.find_one({"_id": ObjectId(message_id)})
-        if not msg:
-            return None
-        if msg["user_id"] != user_id:
+    async def edit_message(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str, content: str, room_ids: Iterable[str]) -> Optional[dict]:
+        oid = _object_id(message_id)
+        if oid is None:
             return None
-        update = {
-            "$set": {
-                "content": content,
-                "edited": True,
-                "edited_at": datetime.utcnow(),
-            }
-        }
-        await mongo_db.messages.update_one({"_id": ObjectId(message_id)}, update)
-        msg.update(update["$set"])
+        # Author and room checks live in the filter: one round trip, no race
+        msg = await mongo_db.messages.find_one_and_update(
+            {"_id": oid, "user_id": user_id, "room_id": {"$in": list(room_ids)}},
+            {"$set": {"content": content, "edited": True, "edited_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if msg:
+            msg["id"] = str(msg["_id"])
+            await RecentHistoryCache.replace(msg)
         return msg
 
     @staticmethod
-    async def delete_message(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str) -> bool:
-        from bson import ObjectId
-        msg = await mongo_db.messages.find_one({"_id": ObjectId(message_id)})
-        if not msg:
-            return False
-        if msg["user_id"] == user_id:
-            result = await mongo_db.messages.delete_one({"_id": ObjectId(message_id)})
-            return result.deleted_count == 1
-        # If not author, check if user is admin in the room
-        async with get_pg_session() as session:
-            result = await session.execute(
-                select(RoomMembership).where(RoomMembership.room_id == msg["room_id"], RoomMembership.user_id == user_id, RoomMembership.role == "admin", RoomMembership.is_active == True)
-            )
-            admin = result.scalars().first()
-            if admin:
-                result = await mongo_db.messages.delete_one({"_id": ObjectId(message_id)})
-                return result.deleted_count == 1
-        return False
+    async def delete_message(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str, room_ids: Iterable[str], admin_room_ids: Iterable[str]) -> Optional[dict]:
+        oid = _object_id(message_id)
+        if oid is None:
+            return None
+        # Authors may delete their own messages, room admins any message in the room
+        deleted = await mongo_db.messages.find_one_and_delete(
+            {
+                "_id": oid,
+                "$or": [
+                    {"user_id": user_id, "room_id": {"$in": list(room_ids)}},
+                    {"room_id": {"$in": list(admin_room_ids)}},
+                ],
+            },
+            projection={"_id": 1, "room_id": 1},
+        )
+        if deleted:
+            await RecentHistoryCache.remove(deleted["room_id"], str(deleted["_id"]))
+        return deleted
 
     @staticmethod
-    async def add_reaction(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str, emoji: str) -> dict:
-        msg = await mongo_db.messages.find_one({"_id": ObjectId(message_id)})
-        if not msg:
+    async def add_reaction(mongo_db: AsyncIOMotorDatabase, message_id: str, user_id: str, emoji: str, room_ids: Iterable[str]) -> Optional[dict]:
+        oid = _object_id(message_id)
+        if oid is None:
             return None
-        # Remove any existing reaction by this user
-        reactions = [r for r in msg.get("reactions", []) if r["user_id"] != user_id]
-        reactions.append({"user_id": user_id, "emoji": emoji})
-        update = {"$set": {"reactions": reactions}}
-        await mongo_db.messages.update_one({"_id": ObjectId(message_id)}, update)
-        msg["reactions"] = reactions
-        return msg 
\ No newline at end of file
+        # Pipeline update so replacing this user's reaction is a single atomic
+        # write ($pull and $push can't target the same array in one update)
+        reaction = {"user_id": {"$literal": user_id}, "emoji": {"$literal": emoji}}
+        msg = await mongo_db.messages.find_one_and_update(
+            {"_id": oid, "room_id": {"$in": list(room_ids)}},
+            [{"$set": {"reactions": {"$concatArrays": [
+                {"$filter": {"input": {"$ifNull": ["$reactions", []]}, "cond": {"$ne": ["$$this.user_id", user_id]}}},
+                [reaction],
+            ]}}}],
+            return_document=ReturnDocument.AFTER,
+        )
+        if msg:
+            msg["id"] = str(msg["_id"])
+            await RecentHistoryCache.replace(msg)
+        return msg
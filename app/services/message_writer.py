@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+from app.core import database
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+class MessageWriteBuffer:
+    # Write-behind buffer: accepted messages are batched per worker and written
+    # with insert_many once batch_size is reached or flush_interval_ms elapses.
+    # Each enqueue returns a future that resolves only once the insert succeeded.
+    def __init__(self, batch_size: Optional[int] = None, flush_interval_ms: Optional[int] = None):
+        self.batch_size = batch_size or settings.message_batch_size
+        self.flush_interval = (flush_interval_ms or settings.message_batch_interval_ms) / 1000
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    def enqueue(self, doc: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._schedule_flush)
+        return future
+
+    def _schedule_flush(self):
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        failed = {}
+        try:
+            await database.get_mongo_db().messages.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                # Ids are assigned up front, so a duplicate means it is already stored
+                if error.get("code") != DUPLICATE_KEY:
+                    failed[error["index"]] = RuntimeError(error.get("errmsg", "write failed"))
+        except Exception as e:
+            logger.exception("Flushing %d buffered messages failed", len(batch))
+            failed = {index: e for index in range(len(batch))}
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(True)
+
+    async def close(self):
+        await self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+message_writer = MessageWriteBuffer()
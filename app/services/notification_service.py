@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from functools import partial
+from typing import List, Set
+from app.services.presence_service import PresenceService
+from app.services.membership_index import MembershipIndex
+from app.tasks.celery_tasks import send_bulk_notification
+
+logger = logging.getLogger(__name__)
+
+# Strong references so fire-and-forget dispatches aren't garbage collected
+_pending: Set[asyncio.Task] = set()
+
+class NotificationService:
+    @staticmethod
+    async def get_offline_members(room_id: str, sender_id: str) -> List[str]:
+        members = await MembershipIndex.get_room_members(room_id)
+        member_ids = [uid for uid in members if uid != sender_id]
+        if not member_ids:
+            return []
+        # One MGET for the whole room instead of a GET per member
+        presence = await PresenceService.get_presence(member_ids)
+        return [uid for uid in member_ids if not presence[uid]]
+
+    @staticmethod
+    async def notify_offline_members(room_id: str, sender_id: str):
+        offline = await NotificationService.get_offline_members(room_id, sender_id)
+        if not offline:
+            return
+        # .delay() talks to the broker synchronously, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(send_bulk_notification.delay, offline, f"New message in room {room_id}"))
+
+    @staticmethod
+    async def _notify(room_id: str, sender_id: str):
+        try:
+            await NotificationService.notify_offline_members(room_id, sender_id)
+        except Exception:
+            logger.exception("Offline notification dispatch failed for room %s", room_id)
+
+    @staticmethod
+    def dispatch(room_id: str, sender_id: str):
+        task = asyncio.create_task(NotificationService._notify(room_id, sender_id))
+        _pending.add(task)
+        task.add_done_callback(_pending.discard)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Set
+from app.core import database
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Drops one connection and clears the online flag once none are left alive
+DISCONNECT_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local remaining = redis.call('ZCARD', KEYS[1])
+if remaining == 0 then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return remaining
+"""
+
+# Local connections (presence id -> user id) and those heard from since the last flush
+_connections: Dict[str, str] = {}
+_heartbeats: Set[str] = set()
+_flusher: Optional[asyncio.Task] = None
+
+def online_key(user_id) -> str:
+    return f"user:{user_id}:online"
+
+def connections_key(user_id) -> str:
+    return f"user:{user_id}:connections"
+
+def _refresh(pipe, presence_id: str, user_id: str, now: float):
+    pipe.zadd(connections_key(user_id), {presence_id: now + settings.presence_ttl})
+    pipe.expire(connections_key(user_id), settings.presence_ttl)
+    pipe.set(online_key(user_id), 1, ex=settings.presence_ttl)
+
+class PresenceService:
+    @staticmethod
+    async def connect(user_id: str) -> str:
+        presence_id = uuid.uuid4().hex
+        _connections[presence_id] = user_id
+        pipe = database.redis.pipeline(transaction=True)
+        _refresh(pipe, presence_id, user_id, time.time())
+        await pipe.execute()
+        return presence_id
+
+    @staticmethod
+    def heartbeat(presence_id: str):
+        # No I/O here: the flusher writes all heartbeats in one pipeline
+        if presence_id in _connections:
+            _heartbeats.add(presence_id)
+
+    @staticmethod
+    async def disconnect(presence_id: str):
+        user_id = _connections.pop(presence_id, None)
+        _heartbeats.discard(presence_id)
+        if user_id is None:
+            return
+        await database.get_redis_script(DISCONNECT_SCRIPT)(
+            keys=[connections_key(user_id), online_key(user_id)], args=[presence_id, time.time()]
+        )
+
+    @staticmethod
+    async def flush() -> int:
+        pending = [presence_id for presence_id in _heartbeats if presence_id in _connections]
+        _heartbeats.clear()
+        if not pending:
+            return 0
+        now = time.time()
+        pipe = database.redis.pipeline(transaction=False)
+        for presence_id in pending:
+            _refresh(pipe, presence_id, _connections[presence_id], now)
+        await pipe.execute()
+        return len(pending)
+
+    @staticmethod
+    async def get_presence(user_ids: Iterable[str]) -> Dict[str, bool]:
+        user_ids = [str(uid) for uid in user_ids]
+        if not user_ids:
+            return {}
+        flags = await database.redis.mget([online_key(uid) for uid in user_ids])
+        return {uid: bool(flag) for uid, flag in zip(user_ids, flags)}
+
+    @staticmethod
+    async def _flush_loop():
+        while True:
+            await asyncio.sleep(settings.presence_flush_interval)
+            try:
+                await PresenceService.flush()
+            except Exception:
+                logger.exception("Presence flush failed")
+
+    @staticmethod
+    def start():
+        global _flusher
+        if _flusher is None:
+            _flusher = asyncio.create_task(PresenceService._flush_loop())
+
+    @staticmethod
+    async def stop():
+        global _flusher
+        if _flusher is None:
+            return
+        _flusher.cancel()
+        try:
+            await _flusher
+        except asyncio.CancelledError:
+            pass
+        _flusher = None
@@ -6,6 +6,7 @@ from sqlalchemy.future import select
 from uuid import UUID
 import datetime
 from typing import List
+from app.services.membership_index import MembershipIndex
 
 class RoomService:
     @staticmethod
@@ -26,8 +27,9 @@ class RoomService:
             is_active=True
         )
         session.add(membership)
+        # Defaults are filled in client-side, so no refresh round trip is needed
         await session.commit()
-        await session.refresh(room)
+        await MembershipIndex.add(room.id, creator_id)
         return room
 
     @staticmethod
@@ -48,7 +50,7 @@ class RoomService:
         )
         session.add(membership)
         await session.commit()
-        await session.refresh(membership)
+        await MembershipIndex.add(room_id, user_id)
         return membership
 
     @staticmethod
@@ -69,6 +71,7 @@ class RoomService:
             return False
         membership.is_active = False
         await session.commit()
+        await MembershipIndex.remove(room_id, user_id)
         return True
 
     @staticmethod
@@ -78,6 +81,13 @@ class RoomService:
         )
         return result.scalars().all()
 
+    @staticmethod
+    async def get_admin_room_ids(session: AsyncSession, user_id: UUID) -> List[str]:
+        result = await session.execute(
+            select(RoomMembership.room_id).where(RoomMembership.user_id == user_id, RoomMembership.role == "admin", RoomMembership.is_active == True)
+        )
+        return [str(room_id) for room_id in result.scalars().all()]
+
     @staticmethod
     async def get_room_members(session: AsyncSession, room_id: UUID) -> List[User]:
         result = await session.execute(
@@ -105,4 +115,5 @@ class RoomService:
             return False
         membership.is_active = False
         await session.commit()
+        await MembershipIndex.remove(room_id, target_user_id)
         return True 
\ No newline at end of file
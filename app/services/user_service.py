@@ -1,6 +1,6 @@
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password_async, verify_password_async, cache_principal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import Optional
@@ -11,19 +11,21 @@ class UserService:
         user = User(
             username=user_data.username,
             email=user_data.email,
-            hashed_password=hash_password(user_data.password),
+            hashed_password=await hash_password_async(user_data.password),
             full_name=user_data.full_name
         )
         session.add(user)
+        # Defaults are filled in client-side, so no refresh round trip is needed
         await session.commit()
-        await session.refresh(user)
         return user
 
     @staticmethod
     async def authenticate_user(session: AsyncSession, username: str, password: str) -> Optional[User]:
         result = await session.execute(select(User).where(User.username == username))
         user = result.scalars().first()
-        if user and verify_password(password, user.hashed_password):
+        # Hand the connection back to the pool before the slow bcrypt check
+        await session.close()
+        if user and await verify_password_async(password, user.hashed_password):
             return user
         return None
 
@@ -34,18 +36,38 @@ class UserService:
 
     @staticmethod
     async def update_user(session: AsyncSession, user_id: str, update_data: UserUpdate) -> User:
+        hashed_password = None
+        if update_data.password is not None:
+            # The request's shared session may already hold a connection from
+            # authentication; hand it back before the slow bcrypt hash
+            await session.close()
+            hashed_password = await hash_password_async(update_data.password)
         result = await session.execute(select(User).where(User.id == user_id))
         user = result.scalars().first()
         if not user:
             return None
         if update_data.full_name is not None:
             user.full_name = update_data.full_name
-        if update_data.password is not None:
-            user.hashed_password = hash_password(update_data.password)
+        if hashed_password is not None:
+            user.hashed_password = hashed_password
+            user.token_version = (user.token_version or 0) + 1
         await session.commit()
-        await session.refresh(user)
+        # Replace the cached principal so the new version is seen immediately
+        cache_principal(user)
         return user
 
+    @staticmethod
+    async def deactivate_user(session: AsyncSession, user_id: str) -> bool:
+        result = await session.execute(select(User).where(User.id == user_id))
+        user = result.scalars().first()
+        if not user:
+            return False
+        user.is_active = False
+        user.token_version = (user.token_version or 0) + 1
+        await session.commit()
+        cache_principal(user)
+        return True
+
     @staticmethod
     async def get_user_rooms(session: AsyncSession, user_id: str):
         # To be implemented
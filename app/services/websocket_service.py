@@ -1 +1,73 @@
- 
\ No newline at end of file
+import asyncio
+import logging
+from typing import Optional, Set
+from fastapi import WebSocket, status
+from app.core.config import settings
+from app.core import metrics
+from app.utils.serialization import encode_frame
+
+logger = logging.getLogger(__name__)
+
+class Connection:
+    def __init__(self, websocket: WebSocket, user_id: str, queue_size: Optional[int] = None, overflow_policy: Optional[str] = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.ws_send_queue_size)
+        # "drop_oldest" sheds stale frames, "disconnect" evicts the slow consumer
+        self.overflow_policy = overflow_policy or settings.ws_overflow_policy
+        self.closed = False
+        self.dropped = 0
+        # Rooms this socket is subscribed to; one socket can carry many
+        self.rooms: Set[str] = set()
+        # Profile every message on this socket (X-Profile on the handshake)
+        self.profile = False
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send_json(self, message: dict) -> bool:
+        return self.send(encode_frame(message))
+
+    def send(self, frame: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.overflow_policy == "disconnect":
+            logger.info("Evicting slow consumer %s", self.user_id)
+            metrics.WS_EVICTIONS.inc()
+            self._closer = asyncio.create_task(self.close(code=status.WS_1013_TRY_AGAIN_LATER))
+            return False
+        self.queue.get_nowait()
+        self.dropped += 1
+        metrics.WS_DROPPED_FRAMES.inc()
+        self.queue.put_nowait(frame)
+        return True
+
+    async def close(self, code: Optional[int] = None):
+        if self.closed:
+            return
+        self.closed = True
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+
+    async def _write_loop(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.debug("Writer for %s stopped", self.user_id, exc_info=True)
+            self.closed = True
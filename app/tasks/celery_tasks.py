@@ -1,5 +1,9 @@
 from celery import Celery
+from pymongo import MongoClient
+from redis import Redis
+from typing import Optional
 import os
+from app.core.config import settings
 
 celery_app = Celery(
     "chat_app",
@@ -7,6 +11,11 @@ celery_app = Celery(
     backend=os.getenv("REDIS_URL", "redis://localhost:6379/0")
 )
 
+# Image work runs on its own queue so a small, CPU-bounded worker pool handles it
+celery_app.conf.task_routes = {
+    'app.tasks.celery_tasks.generate_attachment_previews': {'queue': 'previews'},
+}
+
 celery_app.conf.beat_schedule = {
     'cleanup-old-messages-daily': {
         'task': 'app.tasks.celery_tasks.cleanup_old_messages',
@@ -18,11 +27,53 @@ celery_app.conf.beat_schedule = {
     },
 }
 
+# One client each per worker process, created lazily so none is shared across a fork
+_mongo_client: Optional[MongoClient] = None
+_redis_client: Optional[Redis] = None
+
+def _mongo_db():
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = MongoClient(settings.mongodb_url)
+    return _mongo_client[settings.mongodb_name]
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis_client
+
 @celery_app.task
 def send_notification(user_id: str, message: str):
     print(f"Send notification to {user_id}: {message}")
     return True
 
+@celery_app.task
+def send_bulk_notification(user_ids: list, message: str):
+    for user_id in user_ids:
+        print(f"Send notification to {user_id}: {message}")
+    return len(user_ids)
+
+@celery_app.task
+def generate_attachment_previews(digest: str, extension: str):
+    from app.services.file_service import FileService
+    from app.services.history_cache import RecentHistoryCache
+    from app.utils.images import render_variants, preview_variants
+    targets = {
+        variant: (FileService.variant_path(digest, variant), edge, quality)
+        for variant, (edge, quality) in preview_variants(settings.thumbnail_size, settings.preview_size).items()
+    }
+    render_variants(FileService.path_for(digest, extension), targets)
+    # Messages sent before the previews existed pick them up here
+    messages = _mongo_db().messages
+    query = {"file_url": FileService.url_for(digest, extension), "metadata.thumbnail_url": {"$exists": False}}
+    room_ids = messages.distinct("room_id", query)
+    if room_ids:
+        messages.update_many(query, {"$set": {f"metadata.{key}": url for key, url in FileService.variant_urls(digest).items()}})
+        # Cached first pages still hold the old documents
+        RecentHistoryCache.invalidate_sync(_redis(), room_ids)
+    return digest
+
 @celery_app.task
 def cleanup_old_messages():
     print("Cleanup old messages task running...")
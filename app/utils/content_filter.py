@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def normalize(text: str) -> str:
+    # NFKC folds compatibility forms (full-width, ligatures), casefold handles ß etc.
+    return unicodedata.normalize("NFKC", text).casefold()
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+class ContentFilter:
+    # Aho-Corasick automaton: one pass over the message whatever the list size
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[str]] = [[]]
+        self.size = 0
+        for word in words:
+            word = normalize(word.strip())
+            if word:
+                self._add(word)
+        self._link()
+
+    def _add(self, word: str):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = nxt
+        if word not in self._outputs[node]:
+            self._outputs[node].append(word)
+            self.size += 1
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._outputs[nxt] = self._outputs[nxt] + self._outputs[self._fail[nxt]]
+
+    def find(self, text: str) -> Optional[str]:
+        text = normalize(text)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for word in outputs[node]:
+                start = i - len(word) + 1
+                # Whole words only: "spam" must not match inside "spamalot"
+                if (start == 0 or not _is_word_char(text[start - 1])) and (i == last or not _is_word_char(text[i + 1])):
+                    return word
+        return None
+
+class WordListFilter:
+    # Reloads the automaton when the word list file changes, checking its
+    # mtime at most every reload_interval seconds
+    def __init__(self, path: Optional[str], default_words: Iterable[str], reload_interval: float = 5.0):
+        self.path = path
+        self.default_words = list(default_words)
+        self.reload_interval = reload_interval
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.filter = ContentFilter(self.default_words)
+        self.reload()
+
+    def reload(self) -> bool:
+        self._checked_at = time.monotonic()
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding="utf-8") as f:
+                words = [line for line in f.read().splitlines() if line.strip() and not line.lstrip().startswith("#")]
+        except OSError:
+            logger.exception("Could not load word list %s", self.path)
+            return False
+        self.filter = ContentFilter(words)
+        self._mtime = mtime
+        logger.info("Loaded %d filtered terms from %s", self.filter.size, self.path)
+        return True
+
+    def find(self, text: str) -> Optional[str]:
+        if self.path and time.monotonic() - self._checked_at > self.reload_interval:
+            self.reload()
+        return self.filter.find(text)
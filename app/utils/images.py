@@ -0,0 +1,20 @@
+import os
+from typing import Dict, Tuple
+from PIL import Image
+
+# Variant name -> (longest edge in px, JPEG quality)
+def preview_variants(thumbnail_size: int, preview_size: int) -> Dict[str, Tuple[int, int]]:
+    return {"thumb": (thumbnail_size, 80), "preview": (preview_size, 30)}
+
+def render_variants(source_path: str, targets: Dict[str, Tuple[str, int, int]]):
+    with Image.open(source_path) as image:
+        largest = max(edge for _, edge, _ in targets.values())
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft("RGB", (largest, largest))
+        image = image.convert("RGB")
+        for path, edge, quality in targets.values():
+            copy = image.copy()
+            copy.thumbnail((edge, edge))
+            tmp_path = f"{path}.tmp"
+            copy.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
@@ -0,0 +1,88 @@
+import time
+from typing import Tuple
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from app.core import metrics
+from app.core import profiling
+
+class BodySizeLimitMiddleware:
+    # Rejects oversized uploads from Content-Length before the multipart body
+    # is parsed; chunked bodies are counted as they arrive and cut off at the limit
+    def __init__(self, app, max_body_size: int, paths: Tuple[str, ...]):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > self.max_body_size:
+            response = JSONResponse({"detail": "File too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                # Raised inside the multipart parser; FastAPI turns it into the 413
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+class MetricsMiddleware:
+    # Labels by route template (/api/messages/{room_id}), not the raw path,
+    # to keep the series count bounded
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            metrics.child(
+                metrics.HTTP_REQUEST_DURATION, scope["method"], getattr(route, "path", "unmatched"), str(status_code)
+            ).observe(time.perf_counter() - start)
+
+class ProfilingMiddleware:
+    # Traces each request for the slow-request log and runs cProfile when
+    # sampled or asked for with X-Profile and X-Diagnostics-Token
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers", ()))
+        profile_header = headers.get(b"x-profile")
+        if scope["type"] != "http" or (profile_header is None and not profiling.enabled()):
+            await self.app(scope, receive, send)
+            return
+        token = headers.get(b"x-diagnostics-token")
+        profile = profiling.requested(profile_header and profile_header.decode("latin-1"), token and token.decode("latin-1")) or profiling.sampled()
+        trace = profiling.Trace(f"{scope['method']} {scope['path']}", profile=profile)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                trace.details["status"] = message["status"]
+            await send(message)
+
+        with trace:
+            await self.app(scope, receive, send_with_status)
@@ -0,0 +1,18 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+
+def encode_cursor(created_at: datetime, object_id: ObjectId) -> str:
+    raw = orjson.dumps([created_at.isoformat(), str(object_id)])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, object_id = orjson.loads(raw)
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError):
+        raise ValueError("Invalid cursor")
@@ -3,24 +3,50 @@ import time
 from typing import Dict, Callable, Optional
 from fastapi import Request, HTTPException, status, Depends
 from app.core.config import settings
-from app.core.database import redis
+from app.core import database
+from app.core import metrics
+from app.utils.cache import TTLCache
+
+# GCRA: one key holding the theoretical arrival time (ms), one round trip per
+# check, and atomic because it runs server-side. Returns ms until allowed.
+GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local retry_after = new_tat - window - now
+if retry_after > 0 then
+    return retry_after
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return 0
+"""
 
 class RateLimiter:
     def __init__(self, max_requests: int, window_seconds: int):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
+        self.window_ms = window_seconds * 1000
+        self.interval_ms = max(1, self.window_ms // max_requests)
+        # Keys Redis has already rejected, until their retry-after elapses
+        self._blocked = TTLCache(settings.rate_limit_local_cache_size, window_seconds) if settings.rate_limit_local_prefilter else None
 
+    @metrics.timed("rate_limit")
     async def is_allowed(self, key: str) -> bool:
-        now = int(time.time())
-        window_start = now - self.window_seconds
-        # Use Redis sorted set for sliding window
-        key_name = f"rate:{key}"
-        await redis.zremrangebyscore(key_name, 0, window_start)
-        count = await redis.zcard(key_name)
-        if count >= self.max_requests:
+        if self._blocked is not None and self._blocked.get(key):
+            metrics.child(metrics.RATE_LIMIT_REJECTIONS, "local").inc()
+            return False
+        retry_after_ms = await database.get_redis_script(GCRA_SCRIPT)(keys=[f"rate:gcra:{key}"], args=[self.interval_ms, self.window_ms])
+        if retry_after_ms > 0:
+            metrics.child(metrics.RATE_LIMIT_REJECTIONS, "redis").inc()
+            if self._blocked is not None:
+                self._blocked.set(key, True, ttl=retry_after_ms / 1000)
             return False
-        await redis.zadd(key_name, {str(now): now})
-        await redis.expire(key_name, self.window_seconds)
         return True
 
 rate_limiter = RateLimiter(settings.rate_limit_requests, settings.rate_limit_window)
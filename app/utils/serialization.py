@@ -0,0 +1,11 @@
+import orjson
+from bson import ObjectId
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def encode_frame(message: dict) -> str:
+    # orjson handles datetime/UUID natively; ObjectId falls back to its hex string
+    return orjson.dumps(message, default=_default).decode()
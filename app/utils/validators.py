@@ -1,10 +1,14 @@
 from typing import Optional
+from app.core.config import settings
+from app.utils.content_filter import WordListFilter
 
 BANNED_WORDS = {"spam", "offensive", "banned"}
 
+# Built-in list unless BANNED_WORDS_FILE points at a moderation list
+content_filter = WordListFilter(settings.banned_words_file, BANNED_WORDS if not settings.banned_words_file else ())
+
 def check_message_content(content: str) -> Optional[str]:
-    lowered = content.lower()
-    for word in BANNED_WORDS:
-        if word in lowered:
-            return f"Message contains banned word: {word}"
-    return None 
\ No newline at end of file
+    word = content_filter.find(content)
+    if word:
+        return f"Message contains banned word: {word}"
+    return None
\ No newline at end of file
@@ -0,0 +1,29 @@
+# Helpers shared by the benchmark scripts. Nothing here imports app, so
+# load_test can still configure the environment before the settings load.
+import asyncio
+import time
+
+# Event-loop lag sampling period
+TICK = 0.005
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def latency_summary(prefix: str, values) -> dict:
+    return {
+        f"{prefix}_p50_ms": round(percentile(values, 50) * 1000, 3),
+        f"{prefix}_p95_ms": round(percentile(values, 95) * 1000, 3),
+        f"{prefix}_p99_ms": round(percentile(values, 99) * 1000, 3),
+        f"{prefix}_max_ms": round(max(values, default=0.0) * 1000, 3),
+    }
+
+async def measure_lag(stop: asyncio.Event):
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+    return lags
@@ -0,0 +1,51 @@
+# Per-message cost of the banned-word check: the old lowercase-and-`in` loop
+# over every term versus the compiled automaton, across word-list sizes. Usage:
+#   python -m benchmarks.content_filter --terms 10 1000 10000
+import argparse
+import json
+import random
+import string
+import time
+from app.utils.content_filter import ContentFilter
+
+def legacy_check(words, content):
+    lowered = content.lower()
+    for word in words:
+        if word in lowered:
+            return word
+    return None
+
+def random_word(rng, low=4, high=10):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+def time_per_call(func, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            func(message)
+    return (time.perf_counter() - start) / (rounds * len(messages))
+
+def main(args):
+    rng = random.Random(args.seed)
+    messages = [" ".join(random_word(rng, 2, 8) for _ in range(args.message_words)) for _ in range(200)]
+    for size in args.terms:
+        words = {random_word(rng) for _ in range(size)}
+        automaton = ContentFilter(words)
+        legacy = time_per_call(lambda m: legacy_check(words, m), messages, args.rounds)
+        compiled = time_per_call(automaton.find, messages, args.rounds)
+        print(json.dumps({
+            "benchmark": "content_filter",
+            "terms": len(words),
+            "message_words": args.message_words,
+            "legacy_us_per_message": round(legacy * 1e6, 2),
+            "automaton_us_per_message": round(compiled * 1e6, 2),
+            "speedup": round(legacy / compiled, 2),
+        }))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.content_filter")
+    parser.add_argument("--terms", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--message-words", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
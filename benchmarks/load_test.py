@@ -0,0 +1,296 @@
+# End-to-end load test against app.main:app served in-process by uvicorn:
+# login throughput, N WebSocket clients spread over M rooms (send-to-receive
+# latency, delivery rate, event-loop lag) and history-page throughput. One
+# JSON line per phase. Clients share the server's event loop, so latencies
+# include client overhead and read as an upper bound. Usage:
+#   python -m benchmarks.load_test --offline --clients 200 --rooms 20
+#   python -m benchmarks.load_test --clients 500 --rooms 50   # services from .env
+# --offline runs on SQLite (aiosqlite), mongomock-motor and fakeredis; see
+# benchmarks/requirements.txt.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import time
+import uuid
+from typing import Tuple
+from benchmarks._common import latency_summary, measure_lag
+
+def configure_environment(args):
+    # Settings are read at import time, so this runs before anything from app
+    os.environ.setdefault("RATE_LIMIT_REQUESTS", str(args.rate_limit))
+    os.environ["MESSAGE_WRITE_MODE"] = args.write_mode
+    os.environ["WS_BROADCAST_MODE"] = args.broadcast_mode
+    if args.offline:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="chat-bench-"), "bench.db")
+        os.environ["POSTGRESQL_URL"] = f"sqlite+aiosqlite:///{db_path}"
+        # mongomock has no text indexes
+        os.environ["MONGO_CREATE_INDEXES_ON_STARTUP"] = "false"
+
+def use_local_stand_ins():
+    import fakeredis.aioredis
+    from mongomock_motor import AsyncMongoMockClient
+    from app.core import database
+    from app.tasks.celery_tasks import celery_app
+
+    async def connect():
+        database.mongo_client = AsyncMongoMockClient()
+        database.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    database.connect = connect
+    # No broker offline: offline-member notifications run inline
+    celery_app.conf.task_always_eager = True
+
+async def create_schema():
+    from app.core.database import engine
+    from app.models import room  # noqa: F401
+    from app.models.user import Base
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def gather_limited(concurrency: int, coroutines):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(c) for c in coroutines))
+
+async def timed(coroutine, latencies: list):
+    start = time.perf_counter()
+    result = await coroutine
+    latencies.append(time.perf_counter() - start)
+    return result
+
+async def register_users(http, count: int, concurrency: int):
+    run_id = uuid.uuid4().hex[:8]
+    users = [{"username": f"b{run_id}{i:06d}", "email": f"b{run_id}{i:06d}@example.com", "password": "bench-password"} for i in range(count)]
+    responses = await gather_limited(concurrency, (http.post("/api/auth/register", json=user) for user in users))
+    failed = [r.status_code for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} registrations failed, first status {failed[0]}")
+    return users
+
+async def login_phase(http, users, logins: int, concurrency: int) -> Tuple[dict, dict]:
+    tokens = {}
+    latencies = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+
+    async def login(user):
+        response = await timed(http.post("/api/auth/login", json=user), latencies)
+        if response.status_code == 200:
+            tokens[user["username"]] = response.json()["access_token"]
+        return response.status_code
+
+    # Every user logs in at least once so the socket phase has tokens
+    attempts = [users[i % len(users)] for i in range(max(logins, len(users)))]
+    start = time.perf_counter()
+    statuses = await gather_limited(concurrency, (login(user) for user in attempts))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await ticker
+    ok = statuses.count(200)
+    result = {
+        "phase": "login",
+        "logins": len(attempts),
+        "concurrency": concurrency,
+        "rejected": statuses.count(503),
+        "failed": len(statuses) - ok - statuses.count(503),
+        "elapsed_s": round(elapsed, 4),
+        "logins_per_s": round(ok / elapsed, 2),
+        **latency_summary("latency", latencies),
+        **latency_summary("loop_lag", lags),
+    }
+    return result, tokens
+
+async def create_rooms(http, tokens, users, rooms: int, concurrency: int):
+    room_ids = []
+    for i in range(rooms):
+        headers = {"Authorization": f"Bearer {tokens[users[i]['username']]}"}
+        response = await http.post("/api/rooms/", json={"name": f"bench-{i}"}, headers=headers)
+        response.raise_for_status()
+        room_ids.append(response.json()["id"])
+    # Client i sits in room i % rooms; the first `rooms` clients created them
+    joins = []
+    for i in range(rooms, len(users)):
+        headers = {"Authorization": f"Bearer {tokens[users[i]['username']]}"}
+        joins.append(http.post(f"/api/rooms/{room_ids[i % rooms]}/join", headers=headers))
+    for response in await gather_limited(concurrency, joins):
+        response.raise_for_status()
+    return room_ids
+
+async def websocket_phase(base_url: str, tokens, users, room_ids, messages: int, interval: float, timeout: float) -> dict:
+    import websockets
+
+    rooms = len(room_ids)
+    room_sizes = [0] * rooms
+    for i in range(len(users)):
+        room_sizes[i % rooms] += 1
+    expected = sum(messages * room_sizes[i % rooms] for i in range(len(users)))
+    sent = {}
+    latencies = []
+    errors = []
+    done = asyncio.Event()
+
+    async def open_client(i):
+        ws = await websockets.connect(f"{base_url}/api/ws?token={tokens[users[i]['username']]}", max_size=None)
+        await ws.send(json.dumps({"type": "subscribe", "room_id": room_ids[i % rooms]}))
+        reply = json.loads(await ws.recv())
+        if reply.get("type") != "subscribed":
+            raise RuntimeError(f"subscribe failed: {reply}")
+        return ws
+
+    async def receive(ws):
+        try:
+            async for raw in ws:
+                frame = json.loads(raw)
+                if "error" in frame:
+                    errors.append(frame["error"])
+                started = sent.get(frame.get("content"))
+                if started is None:
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if len(latencies) >= expected:
+                    done.set()
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send(i, ws):
+        room_id = room_ids[i % rooms]
+        for seq in range(messages):
+            content = f"bench {i}-{seq}"
+            sent[content] = time.perf_counter()
+            await ws.send(json.dumps({"type": "message", "room_id": room_id, "content": content}))
+            await asyncio.sleep(interval)
+
+    connect_start = time.perf_counter()
+    sockets = await asyncio.gather(*(open_client(i) for i in range(len(users))))
+    connect_elapsed = time.perf_counter() - connect_start
+    receivers = [asyncio.create_task(receive(ws)) for ws in sockets]
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i, ws) for i, ws in enumerate(sockets)))
+    send_elapsed = time.perf_counter() - start
+    try:
+        await asyncio.wait_for(done.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await ticker
+    await asyncio.gather(*(ws.close() for ws in sockets))
+    await asyncio.gather(*receivers)
+    return {
+        "phase": "websocket",
+        "clients": len(users),
+        "rooms": rooms,
+        "messages_sent": len(sent),
+        "deliveries_expected": expected,
+        "deliveries": len(latencies),
+        "errors": len(errors),
+        "connect_s": round(connect_elapsed, 4),
+        "elapsed_s": round(elapsed, 4),
+        "sent_per_s": round(len(sent) / send_elapsed, 2),
+        "delivered_per_s": round(len(latencies) / elapsed, 2),
+        **latency_summary("latency", latencies),
+        **latency_summary("loop_lag", lags),
+    }
+
+async def history_phase(http, tokens, users, room_ids, requests: int, concurrency: int, limit: int) -> dict:
+    rooms = len(room_ids)
+    latencies = []
+
+    async def fetch(n):
+        i = n % len(users)
+        headers = {"Authorization": f"Bearer {tokens[users[i]['username']]}"}
+        response = await timed(http.get(f"/api/messages/{room_ids[i % rooms]}", params={"limit": limit}, headers=headers), latencies)
+        return response.status_code
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    start = time.perf_counter()
+    statuses = await gather_limited(concurrency, (fetch(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await ticker
+    ok = statuses.count(200)
+    return {
+        "phase": "history",
+        "requests": requests,
+        "concurrency": concurrency,
+        "page_size": limit,
+        "failed": requests - ok,
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_s": round(ok / elapsed, 2),
+        **latency_summary("latency", latencies),
+        **latency_summary("loop_lag", lags),
+    }
+
+async def main(args):
+    configure_environment(args)
+    if args.offline:
+        use_local_stand_ins()
+    import httpx
+    import uvicorn
+    from app.main import app
+    from app.core.config import settings
+
+    await create_schema()
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    common = {
+        "benchmark": "load_test",
+        "backends": "offline" if args.offline else "services",
+        "write_mode": settings.message_write_mode,
+        "broadcast_mode": settings.ws_broadcast_mode,
+    }
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as http:
+            users = await register_users(http, args.clients, args.setup_concurrency)
+            login, tokens = await login_phase(http, users, args.logins, args.login_concurrency)
+            print(json.dumps({**common, **login}), flush=True)
+            room_ids = await create_rooms(http, tokens, users, args.rooms, args.setup_concurrency)
+            result = await websocket_phase(f"ws://127.0.0.1:{port}", tokens, users, room_ids, args.messages, args.interval, args.drain_timeout)
+            print(json.dumps({**common, **result}), flush=True)
+            result = await history_phase(http, tokens, users, room_ids, args.history_requests, args.history_concurrency, args.page_size)
+            print(json.dumps({**common, **result}), flush=True)
+    finally:
+        server.should_exit = True
+        await serving
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test")
+    parser.add_argument("--offline", action="store_true", help="SQLite, mongomock-motor and fakeredis instead of the configured services")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=20, help="messages sent by each client")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between a client's messages")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    parser.add_argument("--history-requests", type=int, default=1000)
+    parser.add_argument("--history-concurrency", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--setup-concurrency", type=int, default=8)
+    parser.add_argument("--write-mode", choices=["direct", "write_behind"], default="direct")
+    parser.add_argument("--broadcast-mode", choices=["local", "redis"], default="local")
+    parser.add_argument("--rate-limit", type=int, default=1000000, help="RATE_LIMIT_REQUESTS unless already set")
+    args = parser.parse_args()
+    if args.rooms < 1 or args.clients < args.rooms:
+        parser.error("--clients must be at least --rooms, and --rooms at least 1")
+    asyncio.run(main(args))
@@ -0,0 +1,51 @@
+# Event-loop lag while bcrypt verifications run, inline (old behaviour) versus
+# on the bounded hashing pool. Usage:
+#   python -m benchmarks.login_event_loop_lag --logins 10 50 200
+import argparse
+import asyncio
+import json
+import time
+from app.core import security
+from benchmarks._common import TICK, measure_lag, percentile
+
+async def run(mode: str, logins: int, hashed: str) -> dict:
+    async def verify_inline():
+        return security.verify_password("correct horse", hashed)
+
+    async def verify_pooled():
+        return await security.verify_password_async("correct horse", hashed)
+
+    verify = verify_inline if mode == "inline" else verify_pooled
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(TICK * 4)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await ticker
+    rejected = sum(isinstance(r, security.PasswordHashingBusy) for r in results)
+    return {
+        "benchmark": "login_event_loop_lag",
+        "mode": mode,
+        "logins": logins,
+        "rejected": rejected,
+        "elapsed_s": round(elapsed, 4),
+        "logins_per_s": round((logins - rejected) / elapsed, 2),
+        "loop_lag_p50_ms": round(percentile(lags, 50) * 1000, 3),
+        "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 3),
+    }
+
+async def main(logins_levels, modes):
+    hashed = security.hash_password("correct horse")
+    for mode in modes:
+        for logins in logins_levels:
+            print(json.dumps(await run(mode, logins, hashed)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.login_event_loop_lag")
+    parser.add_argument("--logins", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--modes", nargs="+", choices=["inline", "pooled"], default=["inline", "pooled"])
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.modes))
@@ -0,0 +1,74 @@
+# Sustained message persistence: one insert_one per message (direct) versus the
+# write-behind buffer. Each producer behaves like a socket, sending its next
+# message as soon as the previous one is stored. Usage:
+#   python -m benchmarks.message_persistence --producers 50 --messages 200
+#   python -m benchmarks.message_persistence --mock   # mongomock-motor and fakeredis, no servers
+import argparse
+import asyncio
+import json
+import time
+from app.core import database
+from app.core.config import settings
+from app.schemas.message import MessageCreate
+from app.services.message_service import MessageService
+from app.services.message_writer import MessageWriteBuffer
+from benchmarks._common import percentile
+
+async def produce(mode: str, writer: MessageWriteBuffer, producer: int, messages: int, latencies: list):
+    mongo_db = database.get_mongo_db()
+    room_id = f"bench-room-{producer % 10}"
+    payload = MessageCreate(content="benchmark message")
+    for _ in range(messages):
+        start = time.perf_counter()
+        if mode == "direct":
+            await MessageService.create_message(mongo_db, room_id, str(producer), "bench", payload)
+        else:
+            await writer.enqueue(await MessageService.build_message(room_id, str(producer), "bench", payload))
+        latencies.append(time.perf_counter() - start)
+
+async def run(mode: str, producers: int, messages: int) -> dict:
+    await database.get_mongo_db().messages.delete_many({"room_id": {"$regex": "^bench-room-"}})
+    writer = MessageWriteBuffer()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(produce(mode, writer, p, messages, latencies) for p in range(producers)))
+    await writer.close()
+    elapsed = time.perf_counter() - start
+    total = producers * messages
+    return {
+        "benchmark": "message_persistence",
+        "mode": mode,
+        "producers": producers,
+        "messages": total,
+        "batch_size": writer.batch_size,
+        "batch_interval_ms": settings.message_batch_interval_ms,
+        "elapsed_s": round(elapsed, 4),
+        "messages_per_s": round(total / elapsed, 2),
+        "persist_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "persist_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+async def main(args):
+    # Direct writes also update the recent-history cache, so Redis is needed too
+    if args.mock:
+        import fakeredis.aioredis
+        from mongomock_motor import AsyncMongoMockClient
+        database.mongo_client = AsyncMongoMockClient()
+        database.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    else:
+        await database.mongo_connect()
+        await database.redis_connect()
+    try:
+        for mode in args.modes:
+            print(json.dumps(await run(mode, args.producers, args.messages)))
+    finally:
+        database.mongo_client.close()
+        await database.redis.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.message_persistence")
+    parser.add_argument("--producers", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", choices=["direct", "write_behind"], default=["direct", "write_behind"])
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor and fakeredis instead of MONGODB_URL and REDIS_URL")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+# Cost of the always-on instrumentation: the timed() decorator around a hot
+# coroutine, one labelled datastore observation, and MetricsMiddleware around
+# a trivial route, each against the uninstrumented baseline. Usage:
+#   python -m benchmarks.metrics_overhead --calls 200000 --requests 5000
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from fastapi import FastAPI
+from app.core import metrics
+from app.utils.middleware import MetricsMiddleware
+
+async def noop():
+    return None
+
+async def per_call(func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await func()
+    return (time.perf_counter() - start) / calls
+
+def result(case: str, baseline: float, instrumented: float, **extra) -> dict:
+    return {
+        "benchmark": "metrics_overhead",
+        "case": case,
+        **extra,
+        "baseline_us": round(baseline * 1e6, 3),
+        "instrumented_us": round(instrumented * 1e6, 3),
+        "overhead_us": round((instrumented - baseline) * 1e6, 3),
+        "overhead_pct": round((instrumented - baseline) / baseline * 100, 2) if baseline else None,
+    }
+
+async def decorator_case(calls: int) -> dict:
+    wrapped = metrics.timed("benchmark_noop")(noop)
+    baseline = await per_call(noop, calls)
+    instrumented = await per_call(wrapped, calls)
+    return result("timed_decorator", baseline, instrumented, calls=calls)
+
+def observation_case(calls: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(calls):
+        metrics.observe_datastore("redis", "EVALSHA", 0.0004)
+    elapsed = (time.perf_counter() - start) / calls
+    return result("datastore_observation", 0.0, elapsed, calls=calls)
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/rooms/{room_id}")
+    async def room(room_id: str):
+        return {"id": room_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+async def request_time(app: FastAPI, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/api/rooms/warmup")
+        start = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/api/rooms/{i}")
+        return (time.perf_counter() - start) / requests
+
+async def middleware_case(requests: int) -> dict:
+    baseline = await request_time(build_app(False), requests)
+    instrumented = await request_time(build_app(True), requests)
+    return result("http_middleware", baseline, instrumented, requests=requests)
+
+async def main(args):
+    print(json.dumps(await decorator_case(args.calls)))
+    print(json.dumps(observation_case(args.calls)))
+    print(json.dumps(await middleware_case(args.requests)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.metrics_overhead")
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
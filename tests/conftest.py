@@ -0,0 +1,11 @@
+import fakeredis.aioredis
+import pytest_asyncio
+from app.core import database
+
+@pytest_asyncio.fixture
+async def fake_redis():
+    # Services reach Redis through database.redis at call time
+    previous = database.redis
+    database.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    yield database.redis
+    database.redis = previous
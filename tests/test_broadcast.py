@@ -0,0 +1,100 @@
+import asyncio
+import json
+import fakeredis
+import fakeredis.aioredis
+import pytest
+import pytest_asyncio
+from app.api.websocket import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame: str):
+        self.frames.put_nowait(json.loads(frame))
+
+    async def close(self, code=None):
+        pass
+
+async def next_frame(websocket: FakeWebSocket, timeout: float = 2.0) -> dict:
+    return await asyncio.wait_for(websocket.frames.get(), timeout)
+
+@pytest_asyncio.fixture
+async def managers():
+    # Two workers sharing one Redis server, each with its own client
+    server = fakeredis.FakeServer()
+    instances = [
+        ConnectionManager(mode="redis", redis_client=fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+        for _ in range(2)
+    ]
+    for manager in instances:
+        await manager.start()
+    yield instances
+    for manager in instances:
+        await manager.stop()
+
+async def subscribed_socket(manager: ConnectionManager, user_id: str, room_id: str) -> FakeWebSocket:
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, user_id)
+    await manager.subscribe(connection, room_id)
+    return websocket
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_sockets_on_another_instance(managers):
+    publisher, subscriber = managers
+    websocket = await subscribed_socket(subscriber, "user-b", "room-1")
+
+    await publisher.broadcast_to_room({"type": "message", "content": "hello"}, "room-1")
+
+    assert await next_frame(websocket) == {"type": "message", "content": "hello"}
+
+@pytest.mark.asyncio
+async def test_publishing_instance_delivers_through_redis_once(managers):
+    publisher, subscriber = managers
+    local = await subscribed_socket(publisher, "user-a", "room-1")
+    remote = await subscribed_socket(subscriber, "user-b", "room-1")
+
+    await publisher.broadcast_to_room({"type": "message", "content": "hi"}, "room-1")
+
+    assert await next_frame(local) == {"type": "message", "content": "hi"}
+    assert await next_frame(remote) == {"type": "message", "content": "hi"}
+    await asyncio.sleep(0.1)
+    assert local.frames.empty() and remote.frames.empty()
+
+@pytest.mark.asyncio
+async def test_other_rooms_are_not_delivered(managers):
+    publisher, subscriber = managers
+    websocket = await subscribed_socket(subscriber, "user-b", "room-1")
+
+    await publisher.broadcast_to_room({"type": "message", "content": "elsewhere"}, "room-2")
+    await publisher.broadcast_to_room({"type": "message", "content": "here"}, "room-1")
+
+    assert await next_frame(websocket) == {"type": "message", "content": "here"}
+    assert websocket.frames.empty()
+
+@pytest.mark.asyncio
+async def test_disconnect_drops_the_room_subscription(managers):
+    publisher, subscriber = managers
+    websocket = FakeWebSocket()
+    connection = await subscriber.connect(websocket, "user-b")
+    await subscriber.subscribe(connection, "room-1")
+
+    await subscriber.disconnect(connection)
+
+    assert subscriber.room_count() == 0
+    assert await publisher.redis.pubsub_numsub(ConnectionManager.room_channel("room-1")) == [("room:room-1:broadcast", 0)]
+
+@pytest.mark.asyncio
+async def test_stop_shuts_down_the_listener(managers):
+    manager = managers[0]
+    listener = manager._listener
+
+    await manager.stop()
+
+    assert listener.done()
+    assert manager._listener is None and manager._pubsub is None
+    # Safe to call again during shutdown
+    await manager.stop()
@@ -0,0 +1,89 @@
+import os
+import random
+import re
+import pytest
+from app.utils.content_filter import ContentFilter, WordListFilter
+from app.utils.validators import check_message_content
+
+def whole_word_matches(words, text):
+    # Reference implementation: one regex per word
+    return {word for word in words if re.search(rf"(?<!\w){re.escape(word)}(?!\w)", text)}
+
+@pytest.mark.parametrize("text, expected", [
+    ("this is spam", "spam"),
+    ("SPAM!", "spam"),
+    ("(spam)", "spam"),
+    ("spamalot", None),
+    ("antispam", None),
+    ("spam_bot", None),
+    ("nothing to see", None),
+    ("", None),
+])
+def test_matches_whole_words_only(text, expected):
+    assert ContentFilter(["spam"]).find(text) == expected
+
+def test_normalizes_case_and_compatibility_forms():
+    content_filter = ContentFilter(["spam", "strasse"])
+
+    assert content_filter.find("ＳＰＡＭ") == "spam"
+    assert content_filter.find("Große Straße") == "strasse"
+
+def test_follows_failure_links_after_a_partial_match():
+    content_filter = ContentFilter(["bananas", "nan", "ana"])
+
+    assert content_filter.find("banana nan") == "nan"
+    assert content_filter.find("a banana") is None
+
+def test_reports_a_shorter_word_ending_inside_a_longer_one():
+    content_filter = ContentFilter(["she", "he", "hers"])
+
+    assert content_filter.find("he") == "he"
+    assert content_filter.find("oh hers") == "hers"
+
+def test_ignores_blank_and_duplicate_words():
+    content_filter = ContentFilter(["spam", " spam ", "SPAM", "", "   "])
+
+    assert content_filter.size == 1
+    assert content_filter.find("   ") is None
+
+def test_agrees_with_regex_reference():
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(12)]
+    content_filter = ContentFilter(words)
+    for _ in range(2000):
+        text = "".join(rng.choice("abc  ") for _ in range(rng.randint(0, 20)))
+        expected = whole_word_matches(set(words), text)
+        found = content_filter.find(text)
+        if expected:
+            assert found in expected, text
+        else:
+            assert found is None, text
+
+def test_word_list_file_is_reloaded_when_it_changes(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("# moderation list\nspam\n", encoding="utf-8")
+    word_list = WordListFilter(str(path), ["default"], reload_interval=0)
+    assert word_list.find("spam here") == "spam"
+    assert word_list.find("default") is None
+
+    path.write_text("spam\neggs\n", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert word_list.find("green eggs") == "eggs"
+
+def test_missing_word_list_keeps_the_current_filter(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("spam\n", encoding="utf-8")
+    word_list = WordListFilter(str(path), [], reload_interval=0)
+
+    os.remove(path)
+
+    assert word_list.find("spam") == "spam"
+
+def test_without_a_file_the_default_words_apply():
+    assert WordListFilter(None, ["spam"]).find("spam") == "spam"
+
+def test_check_message_content_names_the_word():
+    assert check_message_content("buy SPAM now") == "Message contains banned word: spam"
+    assert check_message_content("hello there") is None
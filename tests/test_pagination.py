@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+import httpx
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from app.api import messages as messages_api
+from app.core.database import get_mongo_db, get_pg_session
+from app.core.security import get_current_user
+from app.services.message_service import MessageService
+from app.utils.pagination import decode_cursor, encode_cursor
+
+ROOM = "room-1"
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+@pytest_asyncio.fixture
+async def mongo_db(fake_redis):
+    return AsyncMongoMockClient()["chat_test"]
+
+def message(created_at: datetime, object_id: ObjectId = None, room_id: str = ROOM) -> dict:
+    return {
+        "_id": object_id or ObjectId(),
+        "room_id": room_id,
+        "user_id": "user-1",
+        "username": "alice",
+        "content": "hello",
+        "message_type": "text",
+        "file_url": None,
+        "reply_to": None,
+        "reactions": [],
+        "edited": False,
+        "edited_at": None,
+        "created_at": created_at,
+        "metadata": {},
+    }
+
+async def insert(mongo_db, docs):
+    await mongo_db.messages.insert_many([dict(doc) for doc in docs])
+    return docs
+
+def ids(page) -> list:
+    return [msg["_id"] for msg in page["messages"]]
+
+def newest_first(docs) -> list:
+    return [doc["_id"] for doc in sorted(docs, key=lambda doc: (doc["created_at"], doc["_id"]), reverse=True)]
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 123000)
+
+    assert decode_cursor(encode_cursor(created_at, object_id)) == (created_at, object_id)
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10", encode_cursor(START, ObjectId())[:-6], "WyJ4IiwgInkiXQ"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+@pytest.mark.asyncio
+async def test_before_walks_every_message_once(mongo_db):
+    docs = await insert(mongo_db, [message(START + timedelta(seconds=i)) for i in range(7)])
+    seen = []
+    page = await MessageService.get_messages(mongo_db, ROOM, limit=3, before=encode_cursor(START + timedelta(days=1), ObjectId()))
+    while True:
+        seen += ids(page)
+        if not page["next_cursor"]:
+            break
+        page = await MessageService.get_messages(mongo_db, ROOM, limit=3, before=page["next_cursor"])
+
+    assert seen == newest_first(docs)
+
+@pytest.mark.asyncio
+async def test_before_excludes_the_boundary_message(mongo_db):
+    docs = await insert(mongo_db, [message(START + timedelta(seconds=i)) for i in range(3)])
+    boundary = docs[1]
+
+    page = await MessageService.get_messages(mongo_db, ROOM, before=encode_cursor(boundary["created_at"], boundary["_id"]))
+
+    assert ids(page) == [docs[0]["_id"]]
+    assert page["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_after_returns_newer_messages_newest_first(mongo_db):
+    docs = await insert(mongo_db, [message(START + timedelta(seconds=i)) for i in range(6)])
+    boundary = docs[1]
+
+    page = await MessageService.get_messages(mongo_db, ROOM, limit=2, after=encode_cursor(boundary["created_at"], boundary["_id"]))
+
+    # The two messages right after the boundary, newer pages still available
+    assert ids(page) == [docs[3]["_id"], docs[2]["_id"]]
+    assert page["prev_cursor"] is not None
+    newer = await MessageService.get_messages(mongo_db, ROOM, limit=2, after=page["prev_cursor"])
+    assert ids(newer) == [docs[5]["_id"], docs[4]["_id"]]
+
+@pytest.mark.asyncio
+async def test_equal_created_at_is_ordered_by_id(mongo_db):
+    # Same millisecond: _id breaks the tie, so no message is skipped or repeated
+    docs = await insert(mongo_db, [message(START) for _ in range(5)])
+    first = await MessageService.get_messages(mongo_db, ROOM, limit=2, before=encode_cursor(START, ObjectId("f" * 24)))
+    second = await MessageService.get_messages(mongo_db, ROOM, limit=2, before=first["next_cursor"])
+    third = await MessageService.get_messages(mongo_db, ROOM, limit=2, before=second["next_cursor"])
+
+    assert ids(first) + ids(second) + ids(third) == newest_first(docs)
+    assert third["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_cached_first_page_continues_without_gaps(mongo_db):
+    docs = await insert(mongo_db, [message(START + timedelta(milliseconds=i)) for i in range(5)])
+    # First read fills the recent-history cache, the second is served from it
+    from_db = await MessageService.get_messages(mongo_db, ROOM, limit=3)
+    from_cache = await MessageService.get_messages(mongo_db, ROOM, limit=3)
+    rest = await MessageService.get_messages(mongo_db, ROOM, limit=3, before=from_cache["next_cursor"])
+
+    assert ids(from_cache) == ids(from_db)
+    assert ids(from_cache) + ids(rest) == newest_first(docs)
+
+@pytest.mark.asyncio
+async def test_other_rooms_are_not_paged(mongo_db):
+    docs = await insert(mongo_db, [message(START), message(START, room_id="room-2")])
+
+    page = await MessageService.get_messages(mongo_db, ROOM)
+
+    assert ids(page) == [docs[0]["_id"]]
+
+@pytest.mark.asyncio
+async def test_malformed_cursor_returns_400(mongo_db, monkeypatch):
+    async def allow(session, room_id, user_id):
+        return True
+
+    monkeypatch.setattr(messages_api, "require_room_membership", allow)
+    app = FastAPI()
+    app.include_router(messages_api.router, prefix="/api/messages")
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=uuid4())
+    app.dependency_overrides[get_pg_session] = lambda: None
+    app.dependency_overrides[get_mongo_db] = lambda: mongo_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/api/messages/{ROOM}", params={"before": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
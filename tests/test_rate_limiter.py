@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.utils.rate_limiter import RateLimiter
+
+async def allowed(limiter: RateLimiter, key: str, count: int) -> list:
+    return [await limiter.is_allowed(key) for _ in range(count)]
+
+@pytest.mark.asyncio
+async def test_allows_a_full_burst_then_rejects(fake_redis):
+    limiter = RateLimiter(5, 60)
+
+    assert await allowed(limiter, "user-1", 6) == [True] * 5 + [False]
+
+@pytest.mark.asyncio
+async def test_keys_are_limited_independently(fake_redis):
+    limiter = RateLimiter(2, 60)
+
+    assert await allowed(limiter, "user-1", 3) == [True, True, False]
+    assert await allowed(limiter, "user-2", 2) == [True, True]
+
+@pytest.mark.asyncio
+async def test_capacity_returns_one_emission_interval_at_a_time(fake_redis):
+    # 4 per second: a slot frees up every 250 ms
+    limiter = RateLimiter(4, 1)
+    assert await allowed(limiter, "user-1", 5) == [True] * 4 + [False]
+
+    await asyncio.sleep(0.3)
+
+    assert await allowed(limiter, "user-1", 2) == [True, False]
+
+@pytest.mark.asyncio
+async def test_state_is_one_expiring_key(fake_redis):
+    limiter = RateLimiter(10, 60)
+    await limiter.is_allowed("user-1")
+
+    assert await fake_redis.keys("rate:*") == ["rate:gcra:user-1"]
+    assert 0 < await fake_redis.pttl("rate:gcra:user-1") <= limiter.interval_ms
+
+@pytest.mark.asyncio
+async def test_rejected_keys_are_short_circuited_locally(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_local_prefilter", True)
+    limiter = RateLimiter(1, 60)
+    assert await allowed(limiter, "user-1", 2) == [True, False]
+
+    # Redis forgot the key, but the worker still knows it is blocked
+    await fake_redis.delete("rate:gcra:user-1")
+
+    assert await limiter.is_allowed("user-1") is False
+
+@pytest.mark.asyncio
+async def test_without_prefilter_redis_decides(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_local_prefilter", False)
+    limiter = RateLimiter(1, 60)
+    assert await allowed(limiter, "user-1", 2) == [True, False]
+
+    await fake_redis.delete("rate:gcra:user-1")
+
+    assert await limiter.is_allowed("user-1") is True